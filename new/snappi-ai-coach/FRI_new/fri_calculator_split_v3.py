@@ -24,7 +24,8 @@ import logging
 from fri_category_map_v2 import (
     FRI_CATEGORY_MAP,
     TRANSACTION_TYPE_FALLBACK,
-    TRANSACTION_DESC_FALLBACK,
+    classify_by_desc,
+    lookup_mapping,
     ESSENTIAL_MCC_CODES,
     DISCRETIONARY_MCC_CODES,
     INCOME_ROLES,
@@ -221,8 +222,10 @@ class TransactionClassifier:
         fri_roles, fri_essential, fri_needs_enrichment = [], [], []
 
         for _, row in df.iterrows():
-            key = (row.get('TransactionType'), row.get('TransactionSubSubType'))
-            mapping = FRI_CATEGORY_MAP.get(key) or self._fallback_classify(row)
+            mapping = (
+                lookup_mapping(row.get('TransactionType'), row.get('TransactionSubSubType'))
+                or self._fallback_classify(row)
+            )
 
             fri_roles.append(mapping['fri_role'])
             fri_essential.append(mapping['essential'])
@@ -243,8 +246,9 @@ class TransactionClassifier:
 
         if tx_type in TRANSACTION_TYPE_FALLBACK:
             return TRANSACTION_TYPE_FALLBACK[tx_type]
-        if tx_desc in TRANSACTION_DESC_FALLBACK:
-            return TRANSACTION_DESC_FALLBACK[tx_desc]
+        desc_mapping = classify_by_desc(tx_desc)
+        if desc_mapping is not None:
+            return desc_mapping
 
         logger.warning(
             f"Unmapped transaction: type={tx_type}, "
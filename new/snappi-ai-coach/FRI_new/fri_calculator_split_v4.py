@@ -29,7 +29,7 @@ import logging
 from fri_category_map_v4 import (
     FRI_CATEGORY_MAP,
     DEFAULT_ROLE,
-    classify_transaction,
+    classify_transactions,
     INCOME_ROLES,
     ESSENTIAL_SPENDING_ROLES,
     DEBT_SERVICE_ROLES,
@@ -217,17 +217,13 @@ class TransactionClassifier:
 
     def classify(self, df: pd.DataFrame) -> pd.DataFrame:
         df = df.copy()
-        df['fri_net_amount'] = df['CreditAmountLC'].fillna(0) - df['DebitAmountLC'].fillna(0)
+        amounts = df[['CreditAmountLC', 'DebitAmountLC']].fillna(0).to_numpy(dtype=float)
+        credit, debit = amounts[:, 0], amounts[:, 1]
+
+        df['fri_net_amount'] = credit - debit
         df['fri_abs_amount'] = df['fri_net_amount'].abs()
 
-        df['fri_role'] = df.apply(
-            lambda row: classify_transaction(
-                row.get('TransactionType', ''),
-                row.get('CreditAmountLC', 0) or 0,
-                row.get('DebitAmountLC', 0) or 0,
-            ),
-            axis=1,
-        )
+        df['fri_role'] = classify_transactions(df['TransactionType'], credit, debit)
 
         # Essential flag: True for spending, fees, taxes, debt service
         essential_roles = ESSENTIAL_SPENDING_ROLES | UNCLASSIFIED_SPENDING_ROLES | DEBT_SERVICE_ROLES | DEBT_COST_ROLES | INCOME_ROLES
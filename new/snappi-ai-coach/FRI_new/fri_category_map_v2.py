@@ -41,6 +41,9 @@ TAX_LEVY                      Taxes and levies (essential obligation)
 REWARD_CASHBACK               Rewards/cashback (deliberately excluded from FRI components)
 """
 
+import re
+from types import MappingProxyType
+
 
 # ============================================================================
 # ROLE SETS — used by the calculator for filtering
@@ -1114,6 +1117,48 @@ FRI_CATEGORY_MAP = {
 }
 
 
+# ============================================================================
+# SHARED VALUE RECORDS
+# ============================================================================
+# The literal above allocates one value dict per key, but there are only a
+# few dozen distinct (fri_role, essential, needs_enrichment) triples.  Each
+# entry is re-pointed at one shared read-only record per triple, so equal
+# values are the same object.  Callers keep the dict-style interface.
+
+_VALUE_POOL = {}
+
+
+def _intern_values(category_map: dict) -> None:
+    for key, value in category_map.items():
+        triple = (value['fri_role'], value['essential'], value['needs_enrichment'])
+        category_map[key] = _VALUE_POOL.setdefault(triple, MappingProxyType(value))
+
+
+_intern_values(FRI_CATEGORY_MAP)
+
+
+# ============================================================================
+# TWO-LEVEL VIEW: TransactionType → {TransactionSubSubType → mapping}
+# ============================================================================
+# Same entries as FRI_CATEGORY_MAP, bucketed by TransactionType.  A lookup
+# probes two small dicts keyed by already-hashed strings instead of
+# building and hashing a (type, subsub) tuple per row, and an unknown
+# TransactionType is rejected after the first probe.
+
+FRI_CATEGORY_MAP_BY_TYPE = {}
+for (_tx_type, _tx_subsub), _mapping in FRI_CATEGORY_MAP.items():
+    FRI_CATEGORY_MAP_BY_TYPE.setdefault(_tx_type, {})[_tx_subsub] = _mapping
+del _tx_type, _tx_subsub, _mapping
+
+
+def lookup_mapping(tx_type, tx_subsub) -> dict:
+    """Exact-key mapping for (TransactionType, TransactionSubSubType), or None."""
+    bucket = FRI_CATEGORY_MAP_BY_TYPE.get(tx_type)
+    if bucket is None:
+        return None
+    return bucket.get(tx_subsub)
+
+
 # ============================================================================
 # FALLBACK MAPS — used when exact (Type, SubSubType) key is not found
 # ============================================================================
@@ -1144,6 +1189,98 @@ TRANSACTION_DESC_FALLBACK = {
     'Credit Account':            {'fri_role': 'SYSTEM_OPERATION',  'essential': False, 'needs_enrichment': False},
 }
 
+_intern_values(TRANSACTION_TYPE_FALLBACK)
+_intern_values(TRANSACTION_DESC_FALLBACK)
+
+
+# Precedence when one description carries several fallback literals
+# (e.g. 'Tax on Commission'): levies/taxes beat interest, which beats fees.
+TRANSACTION_DESC_PRIORITY = (
+    'Levy',
+    'Tax',
+    'Debit Interests',
+    'Credit Interests',
+    'Commission',
+    'Expenses',
+    'Full Reversal',
+    'Cancellation',
+    'Savings Account Deposit',
+    'Savings Account Withrawal',
+    'Savings Account Withdrawal',
+    'Credit Account',
+)
+
+_DESC_RANK = {pattern: rank for rank, pattern in enumerate(TRANSACTION_DESC_PRIORITY)}
+
+
+# ============================================================================
+# DESCRIPTION MATCHER — one multi-pattern pass per TransactionDescription
+# ============================================================================
+# Built on first use so that importing the map stays a plain constant load.
+# With pyahocorasick installed the literals are compiled into an
+# Aho-Corasick automaton; otherwise into a single regex alternation.
+# Either way each description is scanned exactly once, instead of once
+# per fallback literal.
+
+def _build_desc_scanner():
+    try:
+        import ahocorasick  # optional: pyahocorasick
+    except ImportError:
+        ahocorasick = None
+
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for pattern in TRANSACTION_DESC_PRIORITY:
+            automaton.add_word(pattern, pattern)
+        automaton.make_automaton()
+
+        def scan(text):
+            for end, pattern in automaton.iter(text):
+                start = end - len(pattern) + 1
+                # Whole-word hits only: 'Tax' must not fire on 'Taxi'
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if end + 1 < len(text) and text[end + 1].isalnum():
+                    continue
+                yield pattern
+        return scan
+
+    regex = re.compile(
+        r'\b(?:'
+        + '|'.join(re.escape(p) for p in sorted(TRANSACTION_DESC_PRIORITY, key=len, reverse=True))
+        + r')\b'
+    )
+    return lambda text: (m.group(0) for m in regex.finditer(text))
+
+
+_scan_desc = None
+
+
+def classify_by_desc(tx_desc) -> dict:
+    """
+    Resolve a TransactionDescription through TRANSACTION_DESC_FALLBACK.
+
+    An exact label is a single dict probe.  Otherwise the description is
+    scanned once for every fallback literal and the hit with the highest
+    TRANSACTION_DESC_PRIORITY wins.  Returns None when nothing matches
+    (including NaN / non-string descriptions).
+    """
+    global _scan_desc
+
+    if not isinstance(tx_desc, str):
+        return None
+
+    mapping = TRANSACTION_DESC_FALLBACK.get(tx_desc)
+    if mapping is not None:
+        return mapping
+
+    if _scan_desc is None:
+        _scan_desc = _build_desc_scanner()
+
+    best = min(_scan_desc(tx_desc), key=_DESC_RANK.__getitem__, default=None)
+    return TRANSACTION_DESC_FALLBACK[best] if best is not None else None
+
+
 
 # ============================================================================
 # MCC ENRICHMENT TABLES (for Paymentology data)
@@ -34,6 +34,8 @@ Maintained by: George Tsomidis, PhD — University of Piraeus
 Created: February 2026
 """
 
+import numpy as np
+
 
 # ============================================================================
 # ROLE SETS — unchanged from v3, used by the calculator for filtering
@@ -149,10 +151,66 @@ FRI_CATEGORY_MAP = {
 DEFAULT_ROLE = 'SYSTEM_OPERATION'
 
 
+# ============================================================================
+# DENSE ROLE TABLE — (type_id, direction_id) → uint8 role id
+# ============================================================================
+# The key space is closed (~30 TransactionTypes × 3 directions), so the map
+# is flattened once at import into a bytes table indexed by
+# type_id * N_DIRECTIONS + direction_id.  A lookup is then one probe on an
+# interned type string plus one indexed load — no tuple key is built or
+# hashed.  FRI_CATEGORY_MAP stays the single source of truth.
+
+DIRECTIONS = ('inflow', 'outflow', 'neutral')
+N_DIRECTIONS = len(DIRECTIONS)
+DIRECTION_ID = {d: i for i, d in enumerate(DIRECTIONS)}
+
+TRANSACTION_TYPES = tuple(sorted({tx_type for tx_type, _ in FRI_CATEGORY_MAP}))
+TYPE_ID = {t: i for i, t in enumerate(TRANSACTION_TYPES)}
+
+ROLE_NAMES = tuple(sorted(set(FRI_CATEGORY_MAP.values()) | {DEFAULT_ROLE}))
+ROLE_ID = {r: i for i, r in enumerate(ROLE_NAMES)}
+DEFAULT_ROLE_ID = ROLE_ID[DEFAULT_ROLE]
+
+
+def _build_role_table() -> bytes:
+    table = bytearray([DEFAULT_ROLE_ID]) * (len(TRANSACTION_TYPES) * N_DIRECTIONS)
+    for (tx_type, direction), role in FRI_CATEGORY_MAP.items():
+        table[TYPE_ID[tx_type] * N_DIRECTIONS + DIRECTION_ID[direction]] = ROLE_ID[role]
+    return bytes(table)
+
+
+ROLE_TABLE = _build_role_table()
+
+# Direction id indexed by the sign bits (credit > 0) | (debit > 0) << 1.
+# Credit dominates when both sides are positive.
+DIRECTION_BY_SIGN = (2, 0, 1, 0)    # neither → neutral, credit → inflow, debit → outflow, both → inflow
+
+# Same table viewed as a (n_types, N_DIRECTIONS) uint8 matrix for the
+# column-wise classifier.
+ROLE_LUT = np.frombuffer(ROLE_TABLE, dtype=np.uint8).reshape(len(TRANSACTION_TYPES), N_DIRECTIONS)
+_ROLE_NAME_ARRAY = np.array(ROLE_NAMES, dtype=object)
+_DIRECTION_BY_SIGN_ARRAY = np.array(DIRECTION_BY_SIGN, dtype=np.uint8)
+
+# True where (type, direction) is an explicit map entry — distinguishes a
+# mapped SYSTEM_OPERATION from the DEFAULT_ROLE fallback.
+MAPPED_LUT = np.zeros((len(TRANSACTION_TYPES), N_DIRECTIONS), dtype=bool)
+for _tx_type, _direction in FRI_CATEGORY_MAP:
+    MAPPED_LUT[TYPE_ID[_tx_type], DIRECTION_ID[_direction]] = True
+del _tx_type, _direction
+
+
 # ============================================================================
 # CLASSIFIER FUNCTION
 # ============================================================================
 
+def _classify(tx_type: str, direction_id: int) -> str:
+    """Role for a (TransactionType, direction id) pair — pure table lookup."""
+    type_id = TYPE_ID.get(tx_type)
+    if type_id is None:
+        return DEFAULT_ROLE
+    return ROLE_NAMES[ROLE_TABLE[type_id * N_DIRECTIONS + direction_id]]
+
+
 def classify_transaction(tx_type: str, credit: float, debit: float) -> str:
     """
     Classify a single transaction into an FRI role.
@@ -171,54 +229,89 @@ def classify_transaction(tx_type: str, credit: float, debit: float) -> str:
     str
         FRI role string.
     """
-    if credit > 0:
-        direction = 'inflow'
-    elif debit > 0:
-        direction = 'outflow'
-    else:
-        direction = 'neutral'
+    return _classify(tx_type, DIRECTION_BY_SIGN[(credit > 0) | ((debit > 0) << 1)])
+
+
+def direction_codes(credit, debit) -> np.ndarray:
+    """
+    Column-wise direction as uint8 codes into DIRECTIONS
+    (0 = inflow, 1 = outflow, 2 = neutral). NaN amounts count as zero.
+    """
+    credit = np.asarray(credit, dtype=float)
+    debit = np.asarray(debit, dtype=float)
+    sign_bits = (credit > 0).view(np.uint8) | ((debit > 0).view(np.uint8) << 1)
+    return _DIRECTION_BY_SIGN_ARRAY[sign_bits]
+
+
+def _type_codes(tx_types: 'pd.Series') -> np.ndarray:
+    """TransactionType column → int32 codes into TRANSACTION_TYPES (-1 = unknown)."""
+    return tx_types.map(TYPE_ID).fillna(-1).to_numpy(dtype=np.int32)
+
+
+def classify_transactions(tx_types: 'pd.Series', credit, debit) -> np.ndarray:
+    """
+    Vectorized classify_transaction over whole columns.
+
+    Parameters
+    ----------
+    tx_types : pd.Series
+        TransactionType column.
+    credit, debit : array-like
+        CreditAmountLC / DebitAmountLC columns, aligned with tx_types.
+
+    Returns
+    -------
+    np.ndarray
+        Object array of FRI role strings, one per row.
+    """
+    type_codes = _type_codes(tx_types)
+    dir_codes = direction_codes(credit, debit)
+
+    role_ids = np.full(len(type_codes), DEFAULT_ROLE_ID, dtype=np.uint8)
+    known = type_codes >= 0
+    role_ids[known] = ROLE_LUT[type_codes[known], dir_codes[known]]
 
-    return FRI_CATEGORY_MAP.get((tx_type, direction), DEFAULT_ROLE)
+    return _ROLE_NAME_ARRAY[role_ids]
 
 
 # ============================================================================
 # VALIDATION UTILITIES
 # ============================================================================
 
-def validate_map_completeness(transactions_df: 'pd.DataFrame') -> dict:
+def validate_map_completeness(transactions_df: 'pd.DataFrame', return_unmapped: bool = False) -> dict:
     """
     Check how many transactions in a real dataset are covered by the map.
-    Returns coverage stats and list of unmapped (TransactionType, direction) pairs.
+    Returns coverage stats; with return_unmapped=True also the sorted list of
+    unique unmapped (TransactionType, direction) pairs (None otherwise).
     """
-    mapped = 0
-    unmapped = []
-    total = 0
+    cols = transactions_df.reindex(columns=['TransactionType', 'CreditAmountLC', 'DebitAmountLC'])
 
-    for _, row in transactions_df.iterrows():
-        credit = row.get('CreditAmountLC', 0) or 0
-        debit = row.get('DebitAmountLC', 0) or 0
+    # Null amounts normalised once, up front, for the whole frame
+    amounts = cols[['CreditAmountLC', 'DebitAmountLC']].fillna(0).to_numpy(dtype=float)
+    dir_codes = direction_codes(amounts[:, 0], amounts[:, 1])
 
-        if credit > 0:
-            direction = 'inflow'
-        elif debit > 0:
-            direction = 'outflow'
-        else:
-            direction = 'neutral'
+    tx_types = cols['TransactionType']
+    type_codes = _type_codes(tx_types)
 
-        key = (row.get('TransactionType'), direction)
-        total += 1
+    is_mapped = np.zeros(len(type_codes), dtype=bool)
+    known = type_codes >= 0
+    is_mapped[known] = MAPPED_LUT[type_codes[known], dir_codes[known]]
 
-        if key in FRI_CATEGORY_MAP:
-            mapped += 1
-        else:
-            unmapped.append(key)
+    total = len(is_mapped)
+    mapped = int(is_mapped.sum())
+    unmapped_idx = np.flatnonzero(~is_mapped)
 
-    unique_unmapped = sorted(set(unmapped))
+    unique_unmapped = None
+    if return_unmapped:
+        unique_unmapped = sorted({
+            (tx_type, DIRECTIONS[code])
+            for tx_type, code in zip(tx_types.to_numpy(dtype=object)[unmapped_idx], dir_codes[unmapped_idx])
+        })
 
     return {
         'total_transactions': total,
         'mapped': mapped,
-        'unmapped': len(unmapped),
+        'unmapped': len(unmapped_idx),
         'coverage_rate': mapped / total if total > 0 else 0,
         'unique_unmapped_pairs': unique_unmapped,
         'default_role_applied': DEFAULT_ROLE,
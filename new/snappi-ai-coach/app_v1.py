@@ -4,40 +4,82 @@ os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0"
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"
 
 import time
-import json
+import orjson
+import functools
+import gzip
+import tomllib
 import numpy as np
 import plotly.graph_objects as go
 import plotly.utils
-from flask import Flask, render_template_string, request, jsonify, make_response
+from flask import Flask, Response, request, make_response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from pathlib import Path
 
+try:
+    import brotli
+except ImportError:  # optional - gzip is always available
+    brotli = None
+
 # --- IMPORTS ---
 from models.finbert_analyzer import FinBERTAnalyzer
 from models.fri_calculator import FRICalculator
 from models.llm_generator import LLMGenerator
+from models.inference_worker import InferenceWorker
+from models.response_cache import ResponseCache
 from data.mock_data import get_customer_profiles, get_transaction_history
 from data.case_database import find_similar_cases  # <--- NEW RAG IMPORT
 from chat_history.chat_history_manager import ConversationManager
 
+# --- JSON ---
+# orjson for every payload; OPT_SERIALIZE_NUMPY covers the numpy floats in fri_data
+def dumps_json(obj):
+    """Serialize to JSON bytes"""
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider (request.json / jsonify) backed by orjson"""
+    def dumps(self, obj, **kwargs):
+        return dumps_json(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
 app.secret_key = "fiona_secret_key"
+app.json = ORJSONProvider(app)
 
 # --- SECRETS LOADER ---
-def load_secrets():
-    """Reads ALL API KEYS from secrets.toml"""
+def _parse_secret_lines(text):
+    """Plain KEY = value reader for files tomllib rejects (e.g. unquoted values)"""
+    secrets = {}
+    for line in text.splitlines():
+        if "=" in line:
+            key, value = line.split("=", 1)
+            secrets[key.strip()] = value.strip().strip('"').strip("'")
+    return secrets
+
+@functools.lru_cache(maxsize=1)
+def _read_secrets():
     secrets = {}
     paths = [Path("secrets.toml"), Path(".streamlit/secrets.toml")]
     for path in paths:
         if path.exists():
             try:
-                with open(path, "r", encoding="utf-8") as f:
-                    for line in f:
-                        if "=" in line:
-                            key, value = line.split("=", 1)
-                            secrets[key.strip()] = value.strip().strip('"').strip("'")
-            except Exception as e: print(f"Error reading secrets: {e}")
+                text = path.read_text(encoding="utf-8")
+            except OSError as e:
+                print(f"Error reading secrets: {e}")
+                continue
+            try:
+                secrets.update(tomllib.loads(text))
+            except tomllib.TOMLDecodeError as e:
+                print(f"⚠️ {path} is not valid TOML ({e}), reading it as KEY = value lines")
+                secrets.update(_parse_secret_lines(text))
     return secrets
 
+def load_secrets():
+    """Reads ALL API KEYS from secrets.toml (parsed once per process, returned as a copy)"""
+    return dict(_read_secrets())
+
 # --- SYSTEM STATE ---
 class SystemState:
     def __init__(self):
@@ -47,14 +89,21 @@ class SystemState:
         self.analyzer = FinBERTAnalyzer()
         self.fri_calc = FRICalculator()
         self.llm = LLMGenerator()
-        self.conv_manager = ConversationManager()
+        # Messages are appended to data/conversations/<session>.jsonl and the
+        # tail is reloaded when the session is created, so a restart keeps the chat
+        self.conv_manager = ConversationManager(log_dir=os.getenv(
+            "FIONA_CHAT_LOG_DIR", Path(__file__).parent / "data" / "conversations"))
+        # Batches FinBERT across concurrent requests
+        self.worker = InferenceWorker(self.analyzer)
+        # Exact-match cache of coaching replies (keyed on the recent conversation too)
+        self.reply_cache = ResponseCache()
         
         # 2. Load Specific User (George)
         profiles = get_customer_profiles()
         self.customer = list(profiles.values())[0] # Forces George
         
         # 3. Load 5-Year Granular Data
-        # This returns the dict with 'transactions' (granular) AND 'monthly_income' (aggregated)
+        # This returns the dict with 'transactions_df' (granular) AND 'monthly_income' (aggregated)
         self.transactions = get_transaction_history(self.customer['customer_id'])
         
         # 4. Calculate FRI (CAG Layer 1)
@@ -62,13 +111,13 @@ class SystemState:
         
         # 5. Inject Granular Transactions into FRI Object (CAG Layer 2)
         # This ensures the LLM can see specific line items like "Conference Travel"
-        self.fri_data['transactions'] = self.transactions['transactions']
+        self.fri_data['transactions_df'] = self.transactions['transactions_df']
         
-        # 6. Build History Graph
-        try:
-            self.history = self.fri_calc.calculate_monthly_fri(self.transactions)
-        except:
-            self.history = []
+        # 6. Serialize the radar payload once — fri_data is fixed after
+        # startup. The history graph (history / history_json below) is built
+        # lazily, on the first dashboard hit.
+        components = self.fri_data['components']
+        self.radar_json = dumps_json({'c': [c['name'] for c in components], 'v': [c['score'] for c in components]}).decode()
 
         self.conv_manager.get_or_create_session("session_george")
         
@@ -76,6 +125,25 @@ class SystemState:
         secrets = load_secrets()
         self.llm.setup_providers(secrets)
 
+    @functools.cached_property
+    def history(self):
+        """Monthly FRI history (computed on first access)"""
+        try:
+            return self.fri_calc.calculate_monthly_fri(self.transactions)
+        except (ValueError, KeyError) as e:
+            print(f"⚠️ FRI history unavailable: {e}")
+            return FRICalculator.empty_history()
+
+    @functools.cached_property
+    def history_json(self):
+        hist = self.history
+        return dumps_json({
+            'm': hist['month'].tolist(),  # orjson serializes numeric arrays only
+            'b': hist['buffer'],
+            's': hist['stability'],
+            'mom': hist['momentum']
+        }).decode()
+
 system = SystemState()
 
 # --- FRONTEND TEMPLATE (Visuals) ---
@@ -146,12 +214,17 @@ HTML_TEMPLATE = """
         const typing = document.getElementById('typing');
         const mic = document.getElementById('mic');
 
+        function fmt(text) {
+            return text.replace(/\\*\\*(.*?)\\*\\*/g, '<b>$1</b>').replace(/\\n/g, '<br>');
+        }
+
         function addMsg(text, who) {
             const div = document.createElement('div');
             div.className = `msg ${who}`;
-            div.innerHTML = text.replace(/\\*\\*(.*?)\\*\\*/g, '<b>$1</b>').replace(/\\n/g, '<br>');
+            div.innerHTML = fmt(text);
             chat.appendChild(div);
             chat.scrollTop = chat.scrollHeight;
+            return div;
         }
 
         form.addEventListener('submit', async (e) => {
@@ -161,16 +234,37 @@ HTML_TEMPLATE = """
             input.value = '';
             addMsg(text, 'user');
             typing.innerText = "Fiona is thinking...";
+            // POST the message, then read the SSE-framed reply off the response
+            // body: each `data:` event carries the next text delta
+            let reply = '', bubble = null, buf = '';
             try {
-                const res = await fetch('/api/chat', {
+                const res = await fetch('/api/chat/stream', {
                     method: 'POST',
                     headers: {'Content-Type': 'application/json'},
                     body: JSON.stringify({message: text})
                 });
-                const data = await res.json();
+                if (!res.ok) throw new Error(res.status);
+                const reader = res.body.getReader();
+                const decoder = new TextDecoder();
+                for (;;) {
+                    const {value, done} = await reader.read();
+                    if (done) break;
+                    buf += decoder.decode(value, {stream: true});
+                    let end;
+                    while ((end = buf.indexOf('\\n\\n')) !== -1) {
+                        const ev = buf.slice(0, end);
+                        buf = buf.slice(end + 2);
+                        if (!ev.startsWith('data: ')) continue;  // `event: done`
+                        reply += JSON.parse(ev.slice(6)).delta;
+                        if (!bubble) { typing.innerText = ""; bubble = addMsg('', 'bot'); }
+                        bubble.innerHTML = fmt(reply);
+                        chat.scrollTop = chat.scrollHeight;
+                    }
+                }
                 typing.innerText = "";
-                addMsg(data.response, 'bot');
-            } catch { typing.innerText = "Error."; }
+            } catch (err) {
+                if (!bubble) typing.innerText = "Error.";
+            }
         });
 
         const SpeechRecognition = window.SpeechRecognition || window.webkitSpeechRecognition;
@@ -206,48 +300,71 @@ HTML_TEMPLATE = """
 </html>
 """
 
+# Compiled once at import; rendering no longer re-lexes the template string
+_HOME_TMPL = app.jinja_env.from_string(HTML_TEMPLATE)
+
 # --- ROUTES ---
+# The dashboard page depends only on startup state, so it is rendered once
+# (on the first hit) and then served as-is.
+_home_html = None
+
+def render_home():
+    global _home_html
+    if _home_html is None:
+        _home_html = _HOME_TMPL.render(
+            fri_score=f"{system.fri_data['total_score']:.0f}",
+            name=system.customer['name'].split()[0],
+            radar=system.radar_json,
+            history=system.history_json
+        )
+    return _home_html
+
+# Pre-compressed copies of the page, built once alongside it
+_home_encoded = None
+
+def home_encodings():
+    """{content-encoding: body bytes} for the dashboard page, best first"""
+    global _home_encoded
+    if _home_encoded is None:
+        raw = render_home().encode("utf-8")
+        encoded = {}
+        if brotli is not None:
+            encoded["br"] = brotli.compress(raw, quality=11)
+        encoded["gzip"] = gzip.compress(raw, compresslevel=9)
+        _home_encoded = encoded
+    return _home_encoded
+
 @app.route('/')
 def home():
-    response = make_response(render_template_string(
-        HTML_TEMPLATE,
-        fri_score=f"{system.fri_data['total_score']:.0f}",
-        name=system.customer['name'].split()[0],
-        radar=json.dumps({'c': [c['name'] for c in system.fri_data['components']], 'v': [c['score'] for c in system.fri_data['components']]}),
-        history=json.dumps({
-            'm': [x['month'] for x in system.history],
-            'b': [x['buffer'] for x in system.history],
-            's': [x['stability'] for x in system.history],
-            'mom': [x['momentum'] for x in system.history]
-        })
-    ))
+    encoding = next((enc for enc in home_encodings() if enc in request.accept_encodings), None)
+    if encoding:
+        response = make_response(home_encodings()[encoding])
+        response.headers["Content-Encoding"] = encoding
+    else:
+        response = make_response(render_home())
+    response.headers["Vary"] = "Accept-Encoding"
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
     return response
 
 # ... (Previous imports remain the same) ...
 
-@app.route('/api/chat', methods=['POST'])
-def chat():
-    data = request.json
-    user_msg = data.get('message', '')
-    
+def prepare_turn(user_msg):
+    """Steps 1-4 of a chat turn. Returns (session, generate_coaching kwargs)"""
     # 1. Update History
     session = system.conv_manager.get_or_create_session("session_george")
     session.add_user_message(user_msg)
     
-    # 2. FinBERT Analysis
-    sentiment = system.analyzer.analyze_sentiment(user_msg)
-    stress = system.analyzer.detect_stress(user_msg)
+    # 2. FinBERT Analysis (one forward pass for sentiment + stress)
+    sentiment, stress = system.worker.analyze(user_msg)
     
     # 3. RAG Retrieval
     similar_cases = find_similar_cases(system.customer, system.fri_data['total_score'], user_msg)
     
     # 4. Context Builder (Get clean history string)
     recent = session.get_recent_messages(6) # Increased to 6 for better context
-    context_str = "\n".join([f"{m.role}: {m.content}" for m in recent])
+    context_str = "\n".join(m.formatted for m in recent)
     
-    # 5. Generate Response (PASSING HISTORY SEPARATELY)
-    resp_text = system.llm.generate_coaching(
+    return session, dict(
         customer_message=user_msg,      # The fresh input
         sentiment_result=sentiment,
         stress_analysis=stress,
@@ -256,11 +373,59 @@ def chat():
         customer_data=system.customer,
         chat_history=context_str        # The history buffer
     )
+
+def cached_reply(coaching_args):
+    """
+    Reply cache lookup for this turn, keyed on message + FRI bucket + cases + recent history
+    Returns (reply or None, store) - call store(reply) after a cache miss
+    """
+    user_msg = coaching_args['customer_message']
+    context = system.reply_cache.context(
+        system.fri_data['total_score'], coaching_args['similar_cases'], coaching_args['chat_history'])
+    reply = system.reply_cache.get(user_msg, context)
+    return reply, lambda text: system.reply_cache.put(user_msg, context, text)
+
+@app.route('/api/chat', methods=['POST'])
+def chat():
+    data = request.json
+    session, coaching_args = prepare_turn(data.get('message', ''))
+    
+    # 5. Generate Response (PASSING HISTORY SEPARATELY), unless cached
+    resp_text, store = cached_reply(coaching_args)
+    if resp_text is None:
+        resp_text = system.llm.generate_coaching(**coaching_args)
+        store(resp_text)
     
     # 6. Save & Return
     session.add_assistant_message(resp_text)
-    return jsonify({'response': resp_text, 'audio': None})
+    return Response(dumps_json({'response': resp_text, 'audio': None}), mimetype='application/json')
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of /api/chat. POST (not GET: a turn is appended to the
+    session, and the message stays out of URLs and access logs); the response
+    body is SSE-framed - one `data: {"delta": ...}` per chunk, then `event: done`.
+    """
+    session, coaching_args = prepare_turn(request.json.get('message', ''))
+    cached, store = cached_reply(coaching_args)
+    
+    def events():
+        parts = []
+        chunks = [cached] if cached is not None else system.llm.generate_coaching_stream(**coaching_args)
+        for chunk in chunks:
+            parts.append(chunk)
+            yield b"data: " + dumps_json({'delta': chunk}) + b"\n\n"
+        reply = "".join(parts)
+        if cached is None:
+            store(reply)
+        session.add_assistant_message(reply)
+        yield b"event: done\ndata: {}\n\n"
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
+# Development server only - production runs under gunicorn (see gunicorn.conf.py)
 if __name__ == '__main__':
     print("✅ FIONA v3.3 RUNNING on http://127.0.0.1:5000")
-    app.run(port=5000, debug=True)
\ No newline at end of file
+    app.run(port=5000, debug=os.getenv("FLASK_DEBUG") == "1", threaded=True)
\ No newline at end of file
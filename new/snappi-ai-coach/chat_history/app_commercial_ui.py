@@ -3,10 +3,14 @@ Snappi Financial Coaching - Commercial-Grade UI
 Professional interface similar to ChatGPT, Claude, Gemini
 """
 
+import os
+import asyncio
 import streamlit as st
 from datetime import datetime
 from chat_history_manager import ChatHistory, ConversationManager
-from llm_generator_with_history import LLMGenerator
+from llm_generator_with_history import (
+    LLMGenerator, weakest_component, DEFAULT_CACHE_PATH, DEFAULT_TEMPERATURE
+)
 import json
 from pathlib import Path
 
@@ -290,7 +294,13 @@ def initialize_session_state():
     
     # LLM Generator
     if 'llm' not in st.session_state:
-        st.session_state.llm = LLMGenerator()
+        # Replies only repeat at temperature 0, so only then persist them
+        # (FIONA_LLM_CACHE overrides the sqlite location)
+        temperature = DEFAULT_TEMPERATURE
+        st.session_state.llm = LLMGenerator(
+            temperature=temperature,
+            cache_path=os.getenv("FIONA_LLM_CACHE", DEFAULT_CACHE_PATH) if temperature == 0 else None
+        )
     
     # UI state
     if 'show_settings' not in st.session_state:
@@ -496,12 +506,17 @@ def render_chat_interface():
                     # Show metadata in expander if available
                     if msg.metadata and st.session_state.show_settings:
                         with st.expander("📊 Analysis Details", expanded=False):
-                            if 'fri_score' in msg.metadata:
-                                st.caption(f"FRI Score: {msg.metadata['fri_score']:.0f}/100")
-                            if 'sentiment' in msg.metadata:
-                                st.caption(f"Sentiment: {msg.metadata['sentiment']}")
-                            if 'stress_level' in msg.metadata:
-                                st.caption(f"Stress: {msg.metadata['stress_level']}")
+                            # One lookup per field
+                            meta = msg.metadata
+                            fri_score = meta.get('fri_score')
+                            if fri_score is not None:
+                                st.caption(f"FRI Score: {fri_score:.0f}/100")
+                            sentiment = meta.get('sentiment')
+                            if sentiment is not None:
+                                st.caption(f"Sentiment: {sentiment}")
+                            stress_level = meta.get('stress_level')
+                            if stress_level is not None:
+                                st.caption(f"Stress: {stress_level}")
     
     # Chat input at bottom
     st.markdown("---")
@@ -537,11 +552,10 @@ def process_user_message(user_message: str):
     # Get customer data
     customer_data = st.session_state.customer_data
     
-    # Run analyses (replace with your actual functions)
-    sentiment_result = analyze_sentiment(user_message)
-    stress_analysis = detect_stress(user_message, sentiment_result)
-    fri_result = calculate_fri(customer_data)
-    similar_cases = retrieve_similar_cases(user_message, fri_result)
+    # Run analyses (replace with your actual functions), independent ones in parallel
+    sentiment_result, stress_analysis, fri_result, similar_cases = asyncio.run(
+        gather_analyses(user_message, customer_data)
+    )
     
     # Add user message to history
     chat.add_user_message(
@@ -550,15 +564,15 @@ def process_user_message(user_message: str):
             'fri_score': fri_result.get('total_score'),
             'sentiment': sentiment_result.get('dominant'),
             'stress_level': stress_analysis.get('stress_level'),
-            'weakest_component': min(fri_result['components'], key=lambda x: x['score'])['name']
+            'weakest_component': weakest_component(fri_result)['name']
         }
     )
     
-    # Get conversation context
-    conversation_history = chat.get_context_for_llm()
+    # Full transcript - the generator keeps the recent window and summarizes the rest
+    conversation_history = chat.get_messages()
     
-    # Generate response
-    coaching_response = st.session_state.llm.generate_coaching(
+    # Generate response (drained here; the page rerenders from history)
+    coaching_response = "".join(st.session_state.llm.generate_coaching(
         customer_message=user_message,
         sentiment_result=sentiment_result,
         stress_analysis=stress_analysis,
@@ -566,7 +580,7 @@ def process_user_message(user_message: str):
         similar_cases=similar_cases,
         customer_data=customer_data,
         conversation_history=conversation_history
-    )
+    ))
     
     # Add assistant response to history
     chat.add_assistant_message(
@@ -655,6 +669,7 @@ def render_settings_panel():
         value=10,
         help="Number of previous messages to include"
     )
+    st.session_state.llm.max_window_messages = max_context
     
     st.markdown("---")
     
@@ -740,6 +755,22 @@ def retrieve_similar_cases(message: str, fri: dict) -> list:
     ]
 
 
+async def gather_analyses(user_message: str, customer_data: dict):
+    """Sentiment -> stress runs alongside FRI -> similar cases (threads via asyncio.gather)"""
+    async def text_chain():
+        sentiment = await asyncio.to_thread(analyze_sentiment, user_message)
+        stress = await asyncio.to_thread(detect_stress, user_message, sentiment)
+        return sentiment, stress
+    
+    async def fri_chain():
+        fri = await asyncio.to_thread(calculate_fri, customer_data)
+        cases = await asyncio.to_thread(retrieve_similar_cases, user_message, fri)
+        return fri, cases
+    
+    (sentiment, stress), (fri, cases) = await asyncio.gather(text_chain(), fri_chain())
+    return sentiment, stress, fri, cases
+
+
 # ============================================================================
 # MAIN APP
 # ============================================================================
@@ -3,9 +3,13 @@ Snappi Financial Coaching App - WITH CONVERSATION HISTORY
 Multi-turn chat interface with Fiona AI Coach
 """
 
+import os
+import asyncio
 import streamlit as st
 from chat_history_manager import ChatHistory
-from llm_generator_with_history import LLMGenerator
+from llm_generator_with_history import (
+    LLMGenerator, weakest_component, DEFAULT_CACHE_PATH, DEFAULT_TEMPERATURE
+)
 
 # Import your existing components
 # from finbert_analyzer import FinBERTAnalyzer
@@ -25,7 +29,13 @@ def initialize_session_state():
         )
     
     if 'llm' not in st.session_state:
-        st.session_state.llm = LLMGenerator()
+        # Replies only repeat at temperature 0, so only then persist them
+        # (FIONA_LLM_CACHE overrides the sqlite location)
+        temperature = DEFAULT_TEMPERATURE
+        st.session_state.llm = LLMGenerator(
+            temperature=temperature,
+            cache_path=os.getenv("FIONA_LLM_CACHE", DEFAULT_CACHE_PATH) if temperature == 0 else None
+        )
     
     # Your existing initializations
     # if 'finbert' not in st.session_state:
@@ -62,10 +72,13 @@ def chat_interface():
                         # Show metadata in expander
                         if msg.metadata:
                             with st.expander("📊 Analysis Details", expanded=False):
-                                if 'fri_score' in msg.metadata:
-                                    st.caption(f"FRI Score: {msg.metadata['fri_score']:.0f}/100")
-                                if 'sentiment' in msg.metadata:
-                                    st.caption(f"Sentiment: {msg.metadata['sentiment']}")
+                                # One lookup per field
+                                fri_score = msg.metadata.get('fri_score')
+                                if fri_score is not None:
+                                    st.caption(f"FRI Score: {fri_score:.0f}/100")
+                                sentiment = msg.metadata.get('sentiment')
+                                if sentiment is not None:
+                                    st.caption(f"Sentiment: {sentiment}")
                 
                 else:  # assistant
                     with st.chat_message("assistant", avatar="💙"):
@@ -140,11 +153,10 @@ def process_message(user_message: str):
     with st.chat_message("assistant", avatar="💙"):
         with st.spinner("Fiona is thinking..."):
             
-            # Run analyses (use your existing functions)
-            sentiment_result = analyze_sentiment(user_message)
-            stress_analysis = detect_stress(user_message, sentiment_result)
-            fri_result = calculate_fri(customer_data)
-            similar_cases = retrieve_similar_cases(user_message, fri_result)
+            # Run analyses (use your existing functions), independent ones in parallel
+            sentiment_result, stress_analysis, fri_result, similar_cases = asyncio.run(
+                gather_analyses(user_message, customer_data)
+            )
             
             # Add user message to history with metadata
             st.session_state.chat_history.add_user_message(
@@ -153,38 +165,32 @@ def process_message(user_message: str):
                     'fri_score': fri_result.get('total_score'),
                     'sentiment': sentiment_result.get('dominant'),
                     'stress_level': stress_analysis.get('stress_level'),
-                    'weakest_component': min(
-                        fri_result['components'], 
-                        key=lambda x: x['score']
-                    )['name']
+                    'weakest_component': weakest_component(fri_result)['name']
                 }
             )
             
-            # Get conversation context
-            conversation_history = st.session_state.chat_history.get_context_for_llm()
-            
-            # Generate response with history context
-            coaching_response = st.session_state.llm.generate_coaching(
-                customer_message=user_message,
-                sentiment_result=sentiment_result,
-                stress_analysis=stress_analysis,
-                fri_result=fri_result,
-                similar_cases=similar_cases,
-                customer_data=customer_data,
-                conversation_history=conversation_history  # ← KEY ADDITION
-            )
-            
-            # Add Fiona's response to history
-            st.session_state.chat_history.add_assistant_message(
-                content=coaching_response,
-                metadata={
-                    'fri_score': fri_result.get('total_score'),
-                    'provider': st.session_state.llm.provider
-                }
-            )
+            # Full transcript - the generator keeps the recent window and summarizes the rest
+            conversation_history = st.session_state.chat_history.get_messages()
             
-            # Display response
-            st.markdown(coaching_response)
+        # Stream response with history context; write_stream returns the full text
+        coaching_response = st.write_stream(st.session_state.llm.generate_coaching(
+            customer_message=user_message,
+            sentiment_result=sentiment_result,
+            stress_analysis=stress_analysis,
+            fri_result=fri_result,
+            similar_cases=similar_cases,
+            customer_data=customer_data,
+            conversation_history=conversation_history  # ← KEY ADDITION
+        ))
+        
+        # Add Fiona's response to history
+        st.session_state.chat_history.add_assistant_message(
+            content=coaching_response,
+            metadata={
+                'fri_score': fri_result.get('total_score'),
+                'provider': st.session_state.llm.provider
+            }
+        )
 
 
 def analyze_sentiment(message: str) -> dict:
@@ -238,6 +244,26 @@ def retrieve_similar_cases(message: str, fri: dict) -> list:
     ]
 
 
+async def gather_analyses(user_message: str, customer_data: dict):
+    """
+    Run the pre-LLM analyses concurrently. Sentiment -> stress and
+    FRI -> similar cases are the only dependencies, so the two chains
+    overlap and the wall-clock is the slower chain, not the sum.
+    """
+    async def text_chain():
+        sentiment = await asyncio.to_thread(analyze_sentiment, user_message)
+        stress = await asyncio.to_thread(detect_stress, user_message, sentiment)
+        return sentiment, stress
+    
+    async def fri_chain():
+        fri = await asyncio.to_thread(calculate_fri, customer_data)
+        cases = await asyncio.to_thread(retrieve_similar_cases, user_message, fri)
+        return fri, cases
+    
+    (sentiment, stress), (fri, cases) = await asyncio.gather(text_chain(), fri_chain())
+    return sentiment, stress, fri, cases
+
+
 def sidebar_settings():
     """Sidebar with LLM provider settings"""
     
@@ -296,6 +322,7 @@ def sidebar_settings():
         
         if max_context != st.session_state.chat_history.max_context_messages:
             st.session_state.chat_history.max_context_messages = max_context
+        st.session_state.llm.max_window_messages = max_context
 
 
 def main():
@@ -3,14 +3,97 @@ Chat History Manager for Multi-Turn Conversations with Fiona
 Handles conversation memory, context window management, and session persistence
 """
 
+from collections import deque
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
 from typing import List, Dict, Optional
 import json
+import mmap
+import os
+import time
+
+try:
+    import orjson
+except ImportError:  # optional - stdlib json is used for the message log
+    orjson = None
+
+try:
+    import tiktoken
+except ImportError:  # optional - fall back to ~4 characters per token
+    tiktoken = None
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    """cl100k_base encoder on first use; None if tiktoken is missing or cannot load it (e.g. offline, cold cache)"""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Token count of text (cl100k_base via tiktoken, else a len/4 estimate)"""
+    enc = _encoder()
+    if enc is not None:
+        return len(enc.encode(text))
+    return len(text) // 4
+
+
+def _dump_line(record: Dict) -> bytes:
+    """One JSONL line (bytes, newline-terminated)"""
+    if orjson is not None:
+        return orjson.dumps(record, default=str, option=orjson.OPT_SERIALIZE_NUMPY) + b'\n'
+    return json.dumps(record, ensure_ascii=False, default=str).encode('utf-8') + b'\n'
+
+
+def read_log_tail(path, n: int) -> List["ChatMessage"]:
+    """
+    Last n messages of a JSONL message log, read backwards through an mmap
+    so older history is never parsed.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0 or n <= 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = size - 1 if mm[size - 1:size] == b'\n' else size
+            start = end
+            for _ in range(n):
+                start = mm.rfind(b'\n', 0, start)
+                if start < 0:
+                    break
+            lines = mm[start + 1:end].splitlines()
+    
+    loads = orjson.loads if orjson is not None else json.loads
+    return [ChatMessage.from_dict(loads(line)) for line in lines if line.strip()]
+
+
+# Roles are stored as small integer codes; strings exist only at the API edge
+ROLE_USER = 0
+ROLE_ASSISTANT = 1
+_ROLE_NAMES: List[str] = ['user', 'assistant', 'system']
+_ROLE_CODES: Dict[str, int] = {name: code for code, name in enumerate(_ROLE_NAMES)}
+
+
+def _role_code(role: str) -> int:
+    """Integer code for a role string (unknown roles are registered on first use)"""
+    code = _ROLE_CODES.get(role)
+    if code is None:
+        code = _ROLE_CODES[role] = len(_ROLE_NAMES)
+        _ROLE_NAMES.append(role)
+    return code
 
 
 class ChatMessage:
     """Represents a single message in the conversation"""
     
+    __slots__ = ('_role_code', 'content', 'timestamp', '_ts_iso', 'metadata', 'formatted', 'api_dict')
+    
     def __init__(self, role: str, content: str, timestamp: Optional[datetime] = None, 
                  metadata: Optional[Dict] = None):
         """
@@ -25,17 +108,27 @@ class ChatMessage:
         metadata : dict, optional
             Additional context (FRI scores, sentiment, etc.)
         """
-        self.role = role
+        self._role_code = _role_code(role)
         self.content = content
         self.timestamp = timestamp or datetime.now()
+        self._ts_iso = self.timestamp.isoformat()  # timestamps are never mutated
         self.metadata = metadata or {}
+        # "role: content" line for prompt history, formatted once at creation
+        self.formatted = f"{role}: {content}"
+        # OpenAI/Claude message dict, built once and shared - treat as read-only
+        self.api_dict = {'role': role, 'content': content}
+    
+    @property
+    def role(self) -> str:
+        """'user' or 'assistant'"""
+        return _ROLE_NAMES[self._role_code]
     
     def to_dict(self):
         """Convert to dictionary for JSON serialization"""
         return {
             'role': self.role,
             'content': self.content,
-            'timestamp': self.timestamp.isoformat(),
+            'timestamp': self._ts_iso,
             'metadata': self.metadata
         }
     
@@ -53,7 +146,16 @@ class ChatMessage:
 class ChatHistory:
     """Manages conversation history with context window management"""
     
-    def __init__(self, customer_id: str, max_context_messages: int = 10):
+    __slots__ = (
+        'customer_id', '_max_context', '_archive', '_recent', '_api_recent',
+        'conversation_start', 'session_metadata', 'log_path', '_log',
+        # running aggregates
+        '_user_count', '_assistant_count', '_assistant_len_total', '_topics',
+        '_fri_first', '_fri_last', '_fri_count', '_token_total', '_summary_cache',
+    )
+    
+    def __init__(self, customer_id: str, max_context_messages: int = 10,
+                 log_path: Optional[str] = None):
         """
         Parameters:
         -----------
@@ -61,17 +163,94 @@ class ChatHistory:
             Unique customer identifier
         max_context_messages : int
             Maximum number of recent messages to include in LLM context
+        log_path : str, optional
+            Append-only JSONL file; every added message is written as one line
         """
         self.customer_id = customer_id
-        self.messages: List[ChatMessage] = []
-        self.max_context_messages = max_context_messages
+        self._max_context = max_context_messages
+        # Full transcript (export/stats) + ring buffer of the context window
+        self._archive: List[ChatMessage] = []
+        self._recent = deque(maxlen=max_context_messages)
+        self._api_recent = deque(maxlen=max_context_messages)  # parallel api_dicts
         self.conversation_start = datetime.now()
         self.session_metadata = {}  # Store FRI, customer data, etc.
+        self.log_path = Path(log_path) if log_path else None
+        self._log = open(self.log_path, 'ab') if self.log_path else None
+        self._reset_aggregates()
+    
+    @property
+    def max_context_messages(self) -> int:
+        """Maximum number of recent messages to include in LLM context"""
+        return self._max_context
+    
+    @max_context_messages.setter
+    def max_context_messages(self, n: int):
+        # Resize the context-window ring buffers from the archive
+        self._max_context = n
+        self._recent = deque(self._archive[-n:] if n else (), maxlen=n)
+        self._api_recent = deque((m.api_dict for m in self._recent), maxlen=n)
+    
+    @property
+    def messages(self) -> List[ChatMessage]:
+        """All messages in order (the archive - do not mutate directly)"""
+        return self._archive
+    
+    def _reset_messages(self, messages: List[ChatMessage]):
+        """Replace the transcript, refilling the recent window and aggregates"""
+        self._archive = []
+        self._recent = deque(maxlen=self._max_context)
+        self._api_recent = deque(maxlen=self._max_context)
+        self._reset_aggregates()
+        # One pass: archive, context window and aggregates filled together
+        for message in messages:
+            self._archive.append(message)
+            self._recent.append(message)
+            self._api_recent.append(message.api_dict)
+            self._track(message)
+    
+    def _reset_aggregates(self):
+        """Running totals behind stats/summary, kept current by _track()"""
+        self._user_count = 0
+        self._assistant_count = 0
+        self._assistant_len_total = 0
+        self._topics = set()
+        self._fri_first = None
+        self._fri_last = None
+        self._fri_count = 0
+        self._token_total = 0
+        self._summary_cache = None  # ((message count, started-ago), summary)
+    
+    def _track(self, message: ChatMessage):
+        """Fold one message into the running aggregates (O(1))"""
+        role = message._role_code
+        if role == ROLE_USER:
+            self._user_count += 1
+        elif role == ROLE_ASSISTANT:
+            self._assistant_count += 1
+            self._assistant_len_total += len(message.content)
+        self._token_total += count_tokens(message.content)
+        
+        topic = message.metadata.get('weakest_component')
+        if topic:
+            self._topics.add(topic)
+        fri_score = message.metadata.get('fri_score')
+        if fri_score:
+            if self._fri_first is None:
+                self._fri_first = fri_score
+            self._fri_last = fri_score
+            self._fri_count += 1
     
     def add_message(self, role: str, content: str, metadata: Optional[Dict] = None):
         """Add a new message to the conversation"""
         message = ChatMessage(role=role, content=content, metadata=metadata)
-        self.messages.append(message)
+        self._archive.append(message)
+        self._recent.append(message)  # deque evicts the oldest past the window
+        self._api_recent.append(message.api_dict)
+        self._track(message)
+        if self._log is not None:
+            # O(1) append per turn - the log is never rewritten
+            self._log.write(_dump_line(message.to_dict()))
+            self._log.flush()
         return message
     
     def add_user_message(self, content: str, metadata: Optional[Dict] = None):
@@ -97,7 +276,9 @@ class ChatHistory:
         """
         if n is None:
             n = self.max_context_messages
-        return self.messages[-n:] if len(self.messages) > n else self.messages
+        if n > len(self._recent) and len(self._archive) > len(self._recent):
+            return self._archive[-n:]  # Wider than the ring buffer
+        return list(islice(self._recent, max(0, len(self._recent) - n), None))
     
     def get_context_for_llm(self, include_system: bool = True) -> List[Dict]:
         """
@@ -110,45 +291,51 @@ class ChatHistory:
         
         Returns:
         --------
-        List[Dict] : Messages in OpenAI/Claude format
+        List[Dict] : Messages in OpenAI/Claude format (shared dicts - do not mutate)
         """
-        recent = self.get_recent_messages()
-        
-        # Convert to API format
-        context = [
-            {'role': msg.role, 'content': msg.content}
-            for msg in recent
-        ]
-        
-        return context
+        # API-format dicts are built once per message and kept in step with
+        # the context window, so this is a single list copy
+        return list(self._api_recent)
+    
+    def get_messages(self) -> List[Dict]:
+        """
+        Whole transcript in OpenAI/Claude format, oldest first (shared dicts -
+        do not mutate). For callers that window and summarize the history
+        themselves, e.g. LLMGenerator.compress_history.
+        """
+        return [message.api_dict for message in self._archive]
     
-    def get_conversation_summary(self) -> str:
+    def get_conversation_summary(self, now: Optional[datetime] = None) -> str:
         """
         Generate a summary of the conversation for context compression
         Useful when conversation exceeds context window
+        
+        now : datetime, optional
+            Clock snapshot to measure against (read once if not given)
         """
-        if len(self.messages) <= 3:
+        n = len(self.messages)
+        if n <= 3:
             return "This is the beginning of the conversation."
         
-        # Extract key topics discussed
-        topics = set()
-        for msg in self.messages:
-            if msg.metadata.get('weakest_component'):
-                topics.add(msg.metadata['weakest_component'])
+        # Unchanged until the next message (or until the started-ago text
+        # ticks over), so repeat calls within a turn reuse the last result
+        started = self._time_ago(self.conversation_start, now)
+        if self._summary_cache is not None and self._summary_cache[0] == (n, started):
+            return self._summary_cache[1]
         
-        summary = f"Conversation started {self._time_ago(self.conversation_start)}. "
-        summary += f"Total messages: {len(self.messages)}. "
+        summary = f"Conversation started {started}. "
+        summary += f"Total messages: {n}. "
         
-        if topics:
-            summary += f"Main concerns discussed: {', '.join(topics)}. "
+        # Key topics discussed (tracked as messages are added)
+        if self._topics:
+            summary += f"Main concerns discussed: {', '.join(self._topics)}. "
         
         # Get FRI trend
-        fri_scores = [msg.metadata.get('fri_score') for msg in self.messages 
-                      if msg.metadata.get('fri_score')]
-        if len(fri_scores) >= 2:
-            trend = fri_scores[-1] - fri_scores[0]
+        if self._fri_count >= 2:
+            trend = self._fri_last - self._fri_first
             summary += f"FRI trend: {'+' if trend > 0 else ''}{trend:.0f} points. "
         
+        self._summary_cache = ((n, started), summary)
         return summary
     
     def should_summarize(self, max_tokens: int = 8000) -> bool:
@@ -158,20 +345,33 @@ class ChatHistory:
         Parameters:
         -----------
         max_tokens : int
-            Approximate token limit (rough estimate: 1 message ≈ 200 tokens)
+            Token limit for the conversation
         
         Returns:
         --------
         bool : Whether summarization is needed
         """
-        estimated_tokens = len(self.messages) * 200  # Rough estimate
-        return estimated_tokens > max_tokens * 0.75  # Use 75% threshold
+        # Running count of message tokens, maintained in add_message
+        return self._token_total > max_tokens * 0.75  # Use 75% threshold
     
     def clear_history(self):
-        """Clear all messages (start fresh conversation)"""
-        self.messages = []
+        """Clear all messages (start fresh conversation); the message log is kept"""
+        self._reset_messages([])
         self.conversation_start = datetime.now()
     
+    def restore_from_log(self, n: int = 64):
+        """Reload the last n logged messages (e.g. after a restart)"""
+        if self.log_path is not None and self.log_path.exists():
+            self._reset_messages(read_log_tail(self.log_path, n))
+            if self.messages:
+                self.conversation_start = self.messages[0].timestamp
+    
+    def close(self):
+        """Close the message log"""
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+    
     def export_conversation(self, filepath: Optional[str] = None) -> str:
         """
         Export conversation to JSON for analysis/training data
@@ -183,52 +383,67 @@ class ChatHistory:
         
         Returns:
         --------
-        str : JSON representation of conversation
+        str : JSON representation of conversation, or filepath when the
+              JSON was written straight to disk
         """
         export_data = {
             'customer_id': self.customer_id,
             'conversation_start': self.conversation_start.isoformat(),
-            'conversation_duration_minutes': (datetime.now() - self.conversation_start).total_seconds() / 60,
+            'conversation_duration_minutes': self._minutes_since(self.conversation_start),
             'total_messages': len(self.messages),
             'session_metadata': self.session_metadata,
             'messages': [msg.to_dict() for msg in self.messages]
         }
         
-        json_str = json.dumps(export_data, indent=2, ensure_ascii=False)
+        if orjson is not None:
+            # Metadata carries numpy scalars (FRICalculator scores) that json.dumps
+            # takes as float subclasses; orjson needs the option plus a fallback
+            options = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
         
         if filepath:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(json_str)
+            # Written straight to the file - no intermediate str of the export
+            if orjson is not None:
+                with open(filepath, 'wb') as f:
+                    f.write(orjson.dumps(export_data, default=float, option=options))
+            else:
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    json.dump(export_data, f, indent=2, ensure_ascii=False)
             print(f"✅ Conversation exported to {filepath}")
+            return filepath
         
-        return json_str
+        if orjson is not None:
+            return orjson.dumps(export_data, default=float, option=options).decode('utf-8')
+        return json.dumps(export_data, indent=2, ensure_ascii=False)
     
-    def get_conversation_stats(self) -> Dict:
-        """Get statistics about the conversation"""
-        user_messages = [m for m in self.messages if m.role == 'user']
-        assistant_messages = [m for m in self.messages if m.role == 'assistant']
-        
+    def get_conversation_stats(self, now: Optional[datetime] = None) -> Dict:
+        """Get statistics about the conversation (read from the running aggregates)"""
         return {
             'total_messages': len(self.messages),
-            'user_messages': len(user_messages),
-            'assistant_messages': len(assistant_messages),
-            'duration_minutes': (datetime.now() - self.conversation_start).total_seconds() / 60,
-            'avg_response_length': sum(len(m.content) for m in assistant_messages) / len(assistant_messages) if assistant_messages else 0,
-            'topics_discussed': list({m.metadata.get('weakest_component') for m in self.messages if m.metadata.get('weakest_component')})
+            'user_messages': self._user_count,
+            'assistant_messages': self._assistant_count,
+            'duration_minutes': self._minutes_since(self.conversation_start, now),
+            'avg_response_length': self._assistant_len_total / self._assistant_count if self._assistant_count else 0,
+            'topics_discussed': list(self._topics)
         }
     
     @staticmethod
-    def _time_ago(timestamp: datetime) -> str:
-        """Format timestamp as 'X minutes/hours ago'"""
-        delta = datetime.now() - timestamp
-        minutes = delta.total_seconds() / 60
+    def _minutes_since(timestamp: datetime, now: Optional[datetime] = None) -> float:
+        """Minutes elapsed from timestamp to now (one clock read if now is not given)"""
+        return ((now or datetime.now()) - timestamp).total_seconds() / 60
+    
+    @staticmethod
+    def _time_ago(timestamp: datetime, now: Optional[datetime] = None) -> str:
+        """Format timestamp as 'X minutes/hours ago' (relative to now, if given)"""
+        delta = (now or datetime.now()) - timestamp
+        # Whole minutes in integer math (no float seconds / divisions)
+        minutes = (delta.days * 86400 + delta.seconds) // 60
         
         if minutes < 60:
-            return f"{int(minutes)} minutes ago"
-        elif minutes < 1440:  # 24 hours
-            return f"{int(minutes / 60)} hours ago"
-        else:
-            return f"{int(minutes / 1440)} days ago"
+            return f"{minutes} minutes ago"
+        hours = minutes // 60
+        if hours < 24:
+            return f"{hours} hours ago"
+        return f"{hours // 24} days ago"
     
     def __len__(self):
         """Return number of messages"""
@@ -242,14 +457,26 @@ class ChatHistory:
 class ConversationManager:
     """Manages multiple chat sessions for different customers"""
     
-    def __init__(self):
+    def __init__(self, log_dir: Optional[str] = None):
+        """
+        Parameters:
+        -----------
+        log_dir : str, optional
+            Directory for per-customer JSONL message logs (no persistence if None)
+        """
         self.sessions: Dict[str, ChatHistory] = {}
+        self.log_dir = Path(log_dir) if log_dir else None
+        if self.log_dir is not None:
+            self.log_dir.mkdir(parents=True, exist_ok=True)
     
     def get_or_create_session(self, customer_id: str) -> ChatHistory:
-        """Get existing session or create new one"""
-        if customer_id not in self.sessions:
-            self.sessions[customer_id] = ChatHistory(customer_id)
-        return self.sessions[customer_id]
+        """Get existing session or create new one (resuming its log tail, if any)"""
+        session = self.sessions.get(customer_id)  # one probe on the per-turn hit path
+        if session is None:
+            log_path = self.log_dir / f"{customer_id}.jsonl" if self.log_dir is not None else None
+            session = self.sessions[customer_id] = ChatHistory(customer_id, log_path=log_path)
+            session.restore_from_log()
+        return session
     
     def end_session(self, customer_id: str, export: bool = True) -> Optional[str]:
         """End a customer's session and optionally export"""
@@ -257,9 +484,10 @@ class ConversationManager:
             session = self.sessions[customer_id]
             
             if export:
-                filename = f"conversation_{customer_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+                filename = f"conversation_{customer_id}_{time.strftime('%Y%m%d_%H%M%S')}.json"
                 session.export_conversation(filename)
             
+            session.close()
             del self.sessions[customer_id]
             return filename if export else None
         return None
@@ -270,6 +498,8 @@ class ConversationManager:
     
     def clear_all_sessions(self):
         """Clear all active sessions"""
+        for session in self.sessions.values():
+            session.close()
         self.sessions = {}
 
 
@@ -306,7 +536,7 @@ if __name__ == "__main__":
     
     # Export conversation
     print("\n📁 Exporting conversation:")
-    json_output = chat.export_conversation("test_conversation.json")
+    chat.export_conversation("test_conversation.json")
     print(f"Exported {len(chat.messages)} messages")
     
     print("\n✅ Chat history manager test complete!")
@@ -4,58 +4,321 @@ Handles multi-turn conversations with context window management
 """
 
 import os
-from anthropic import Anthropic
-from openai import OpenAI
-from typing import List, Dict, Optional
+import re
+import logging
+import time
+import hashlib
+import sqlite3
+import functools
+import httpx
+from operator import itemgetter
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+from anthropic import Anthropic, APIError as AnthropicAPIError
+from openai import OpenAI, APIError as OpenAIAPIError
+from typing import List, Dict, Optional, Iterator
+
+try:
+    import tiktoken
+except ImportError:  # optional - estimate_tokens falls back to ~4 chars per token
+    tiktoken = None
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # semantic cache is optional - disabled without it
+    SentenceTransformer = None
+
+
+logger = logging.getLogger(__name__)
+
+# Static Fiona persona. Kept free of customer/FRI interpolation so the prefix is
+# byte-identical on every call and providers can reuse it from their prompt cache.
+FIONA_SYSTEM_PROMPT = """You are Fiona, a compassionate financial coach at Snappi Bank, holding a PhD in Behavioral Economics and Finance. 
+
+Your coaching philosophy:
+- Build on previous conversation context naturally
+- Reference specific things the customer mentioned earlier
+- Show you're actively listening and remembering
+- Acknowledge progress or changes since last interaction
+- Be warm, personal, and genuinely helpful
+- Use behavioral economics principles and gentle nudges
+- Always sign off as "Take care,\\nFiona 💙\\nYour Financial Friend at Snappi"
+
+Important: DO NOT use ** for formatting. Use natural language emphasis instead."""
+
+# Trimmed persona for SIMPLE follow-ups (no coaching-philosophy bullets)
+FIONA_SYSTEM_PROMPT_LITE = """You are Fiona, a warm financial coach at Snappi Bank, continuing an ongoing conversation.
+Always sign off as "Take care,\\nFiona 💙\\nYour Financial Friend at Snappi"
+
+Important: DO NOT use ** for formatting. Use natural language emphasis instead."""
+
+# Message complexity tiers used for model routing
+SIMPLE = "simple"
+COMPLEX = "complex"
+
+# Opt-in on-disk location for the exact-match response cache
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "fiona" / "llm.sqlite"
+
+# Sampling temperature for coaching replies. FIONA_LLM_TEMPERATURE=0 makes
+# replies reproducible (demos, replays), which is what the exact cache needs
+DEFAULT_TEMPERATURE = float(os.getenv("FIONA_LLM_TEMPERATURE", "0.7"))
+
+# Local embedder for the semantic cache and the cosine similarity needed for a hit
+SEMANTIC_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+SEMANTIC_THRESHOLD = 0.92
+
+# Patterns pulled out of older coaching replies when history is compressed
+_EURO_RE = re.compile(r"€\s?\d[\d,.]*")
+_GAIN_RE = re.compile(r"\+(\d+)")
+_FROM_TO_RE = re.compile(r"from (\d+) to (\d+)")
+_FIRST_STEP_RE = re.compile(r"^\s*1\.", re.MULTILINE)
+
+# Sliding-window summarisation of turns that fall out of the token budget
+SUMMARY_PREFIX = "[Context Summary]"
+SUMMARY_INSTRUCTION = """Compress this coaching conversation into at most 200 tokens.
+Preserve every euro amount, FRI score and component (Buffer, Stability, Momentum),
+and any commitments or action steps the customer agreed to. Plain text only."""
+
+# Circuit breaker: after this many consecutive transient failures a provider
+# is skipped for CIRCUIT_COOLDOWN seconds
+CIRCUIT_FAIL_THRESHOLD = 3
+CIRCUIT_COOLDOWN = 30.0
+
+# Output caps sized to the word counts the prompts ask for
+# (200-300 words on follow-ups, 300-400 on the first turn)
+MAX_TOKENS_FOLLOWUP = 450
+MAX_TOKENS_FIRST_TURN = 650
+
+# Last line of the sign-off: Claude stops as soon as it has written it
+SIGNOFF_STOP = "Your Financial Friend at Snappi"
+
+# Anthropic prompt-caching marker (5 minute TTL, refreshed on every hit)
+EPHEMERAL_CACHE = {"type": "ephemeral"}
+
+
+# Mock coaching replies per weakest FRI component, rendered with str.format_map
+_MOCK_OPENING = """Hi {first_name},
+
+I can see why you're feeling this way, and I want you to know that what you're experiencing is completely valid. Looking at your financial situation, you've actually earned €{yearly_income:.0f} this year - that's solid!
+
+However, I've identified the core issue: your {weakest_name} score is {weakest_score:.0f}/100, which is creating the uncertainty you're feeling. """
+
+_MOCK_SIGNOFF = """
+
+Take care,
+Fiona 💙
+Your Financial Friend at Snappi"""
+
+_MOCK_TEMPLATES = {
+    'Stability': _MOCK_OPENING + """Your income varies significantly month to month, making planning impossible.
+
+Here's what can help:
+
+1. Build a 4-month buffer (you're at {buffer_months:.1f} months now)
+   Target: Save €{essential_x2:.0f} over next 3 months
+
+2. Try our Income Smoother feature
+   Distributes earnings evenly across weeks
+   Reduces stress by 70%
+
+3. Consider income diversification
+   Add one steady stream (€{income_20:.0f}/month)
+   Could improve Stability by +15 points
+
+Projected Impact: Your FRI could improve from {total:.0f} to {total_18:.0f} in 3 months.
+
+You're not failing - your situation just needs the right tools. Want to discuss this further?""" + _MOCK_SIGNOFF,
+
+    'Buffer': _MOCK_OPENING + """You have only {buffer_months:.1f} months of emergency savings, creating constant anxiety.
+
+Here's your action plan:
+
+1. Automate €{essential_15:.0f}/month to savings
+   Set up now - adds €{essential_15_year:.0f}/year
+
+2. Round-up savings
+   Every purchase rounds to €5, difference saved
+   Painless €{essential_05:.0f}/month
+
+3. One-time boost
+   Review subscriptions - cancel €{essential_10:.0f}
+   Next bonus goes to emergency fund
+
+These steps could improve Buffer from {buffer_score:.0f} to {buffer_25:.0f} in 6 months, raising FRI to {total_15:.0f}.
+
+Building security takes time, but every €10 counts. What questions do you have?""" + _MOCK_SIGNOFF,
+
+    'Momentum': _MOCK_OPENING + """Your trajectory shows a slow decline over 3 months. Let's reverse this.
+
+Action steps:
+
+1. Spending audit this week
+   Review last month
+   Find €{essential_10:.0f} unnecessary spending
+   Redirect to debt/savings
+
+2. Debt strategy
+   Focus on highest interest first
+   Extra €{essential_15:.0f}/month = debt-free in 18 months vs 30
+
+3. Monthly FRI check-ins
+   Track progress
+   Celebrate wins
+   Adjust as needed
+
+Reversing momentum from {momentum_score:.0f} to {momentum_20:.0f} will raise FRI to {total_12:.0f} within 3 months.
+
+Starting is the hardest part. After that, progress motivates. Shall we tackle step 1 together?""" + _MOCK_SIGNOFF,
+}
+
+
+def weakest_component(fri):
+    """
+    Lowest-scoring FRI component. Uses fri['weakest'] when the producer set
+    it (FRICalculator does), otherwise computes it once and stores it there
+    so later consumers in the same turn reuse it.
+    """
+    weakest = fri.get('weakest')
+    if weakest is None:
+        weakest = fri['weakest'] = min(fri['components'], key=itemgetter('score'))
+    return weakest
+
+
+_HTTP_CLIENT = None
+
+
+def _shared_http_client():
+    """One keep-alive connection pool shared by both SDKs (HTTP/2 when h2 is installed)"""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None:
+        limits = httpx.Limits(max_keepalive_connections=20)
+        try:
+            _HTTP_CLIENT = httpx.Client(http2=True, timeout=30, limits=limits)
+        except ImportError:  # h2 not installed - HTTP/1.1 keep-alive still saves the handshakes
+            _HTTP_CLIENT = httpx.Client(timeout=30, limits=limits)
+    return _HTTP_CLIENT
+
+
+@functools.lru_cache(maxsize=8)
+def _make_client(kind, api_key):
+    """
+    SDK client per (provider, key). Streamlit calls set_provider on every
+    rerun, so without this each turn would build a new client and redo the
+    TCP/TLS handshake.
+    """
+    if kind == 'claude':
+        return Anthropic(api_key=api_key, http_client=_shared_http_client())
+    return OpenAI(api_key=api_key, http_client=_shared_http_client())
 
 
 class LLMGenerator:
     """Generate coaching responses using LLMs with conversation history"""
     
-    def __init__(self):
+    def __init__(self, cache_path: Optional[str] = None, cache_size: int = 512,
+                 semantic_cache_size: int = 1024, temperature: float = DEFAULT_TEMPERATURE):
         self.provider = "mock"
         self.client = None
+        self.clients = {}  # every provider configured this session, for failover
+        self.breaker = {
+            'claude': {'fails': 0, 'open_until': 0.0},
+            'openai': {'fails': 0, 'open_until': 0.0}
+        }
         self.last_error = None
+        self.temperature = temperature
+        
+        # Exact-match response cache (only used when temperature == 0)
+        self.cache_size = cache_size
+        self._response_cache = OrderedDict()
+        self._cache_db = None
+        if cache_path:
+            self._open_cache_db(cache_path)
+        
+        # Semantic cache: ring buffer of unit-norm message embeddings with a
+        # parallel (customer, FRI decile) bucket per row
+        self.semantic_threshold = SEMANTIC_THRESHOLD
+        self.semantic_cache_size = semantic_cache_size
+        self._embedder = None
+        self._sem_vecs = None
+        self._sem_buckets = np.full(semantic_cache_size, -1, dtype=np.int64)
+        self._sem_responses = [None] * semantic_cache_size
+        self._sem_bucket_ids = {}
+        self._sem_count = 0
+        
+        # Collapse older turns to one-liners before each call (copy only,
+        # the ChatHistory itself is untouched)
+        self.enable_progressive_compression = True
+        self.keep_last_verbatim = 6
+        
+        # Token-budgeted window: at most this many recent turns, with older
+        # ones folded into a cumulative summary (cached per prefix). Callers
+        # pass the full transcript (ChatHistory.get_messages()) so there is
+        # something older to fold; keep this at the UI's context setting.
+        self.max_window_messages = 10
+        # The summary boundary advances in steps of this many messages, so
+        # a new summarization call happens every few exchanges rather than
+        # on every turn once the window is full
+        self.summary_fold_messages = 8
+        self._summary_cache = OrderedDict()
+        self._rolling_summary = None  # (n_messages, prefix digest, text)
+        
+        # gpt-4o family tokenizer, loaded on the first count (see _encoder);
+        # counts memoized per content string
+        self._enc = None
+        self._enc_loaded = False
+        self._token_memo = {}
+        
+        # Prompt builder specialised on whether this is a follow-up turn
+        self._prompt_builders = {True: self._prompt_followup, False: self._prompt_first}
+        
         self.context_window_sizes = {
             'gpt-4o-mini': 128000,
             'gpt-4': 8192,
+            'gpt-4o': 128000,
             'claude-sonnet-4-20250514': 200000,
+            'claude-haiku-4-5-20251001': 200000,
             'claude': 200000
         }
+        # Short, low-stress follow-ups go to the fast tier; first turns and
+        # anything stressful keep the full model
+        self.model_tier = {
+            'claude': {SIMPLE: 'claude-haiku-4-5-20251001', COMPLEX: 'claude-sonnet-4-20250514'},
+            'openai': {SIMPLE: 'gpt-4o-mini', COMPLEX: 'gpt-4o'}
+        }
     
     def set_provider(self, provider, api_key=None):
         """Set LLM provider"""
         self.provider = provider.lower()
         self.last_error = None
         
-        print(f"🔧 Setting provider: {self.provider}")
+        logger.debug("Setting provider: %s", self.provider)
         
         if "claude" in self.provider and api_key:
             try:
-                self.client = Anthropic(api_key=api_key)
-                print("✅ Claude client initialized")
+                self.client = self.clients['claude'] = _make_client('claude', api_key)
+                logger.debug("Claude client initialized")
             except Exception as e:
                 self.last_error = f"Claude init error: {str(e)}"
-                print(f"❌ {self.last_error}")
+                logger.error(self.last_error)
                 
         elif "openai" in self.provider or "gpt" in self.provider:
             if api_key:
                 try:
-                    self.client = OpenAI(api_key=api_key)
-                    print("✅ OpenAI client initialized")
+                    self.client = self.clients['openai'] = _make_client('openai', api_key)
+                    logger.debug("OpenAI client initialized")
                 except Exception as e:
                     self.last_error = f"OpenAI init error: {str(e)}"
-                    print(f"❌ {self.last_error}")
+                    logger.error(self.last_error)
             else:
-                print("⚠️ No API key provided for OpenAI")
+                logger.warning("No API key provided for OpenAI")
         else:
-            print("ℹ️ Using mock mode")
+            logger.debug("Using mock mode")
     
     def generate_coaching(self, customer_message, sentiment_result, 
                          stress_analysis, fri_result, similar_cases, customer_data,
-                         conversation_history: Optional[List[Dict]] = None):
+                         conversation_history: Optional[List[Dict]] = None) -> Iterator[str]:
         """
-        Generate personalized coaching response with conversation context
+        Stream a personalized coaching response with conversation context
         
         Parameters:
         -----------
@@ -72,16 +335,18 @@ class LLMGenerator:
         customer_data : dict
             Customer profile information
         conversation_history : List[Dict], optional
-            Previous messages in format [{'role': 'user'/'assistant', 'content': '...'}]
+            The whole conversation in format [{'role': 'user'/'assistant', 'content': '...'}];
+            turns beyond max_window_messages are folded into a summary
         
-        Returns:
-        --------
-        str : Coaching response
+        Yields:
+        -------
+        str : Response chunks as they arrive ("".join() for the full text)
         """
         
-        print(f"\n🤖 Generating coaching with provider: {self.provider}")
-        print(f"   Client initialized: {self.client is not None}")
-        print(f"   Conversation history: {len(conversation_history) if conversation_history else 0} messages")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Generating coaching with provider %s (client: %s, history: %d messages)",
+                         self.provider, self.client is not None,
+                         len(conversation_history) if conversation_history else 0)
         
         # Check if we should use real LLM
         use_llm = (
@@ -92,58 +357,299 @@ class LLMGenerator:
         )
         
         if not use_llm:
-            print("   → Using mock response")
-            return self._generate_mock_response(
+            logger.debug("Using mock response")
+            yield from self._generate_mock_response(
                 customer_message, stress_analysis, fri_result, similar_cases, customer_data
             )
+            return
+        
+        if conversation_history:
+            conversation_history = self.compress_history(conversation_history)
+        
+        if self.enable_progressive_compression and conversation_history:
+            conversation_history = self._compress_history(conversation_history, self.keep_last_verbatim)
+        
+        complexity = self._classify_complexity(customer_message, stress_analysis, conversation_history)
         
         # Build prompt with conversation context
-        system_prompt, user_prompt = self._build_contextual_prompt(
+        build = self._prompt_builders[bool(conversation_history)]
+        system_prompt, user_prompt, max_tokens = build(
             customer_message, sentiment_result, stress_analysis,
-            fri_result, similar_cases, customer_data, conversation_history
+            fri_result, similar_cases, customer_data, complexity
         )
         
-        print(f"   → Calling {self.provider}...")
+        logger.debug("Calling %s (%s)", self.provider, complexity)
         
         # Call appropriate LLM
         if "claude" in self.provider:
-            return self._call_claude_with_history(system_prompt, user_prompt, conversation_history)
+            model = self.model_tier['claude'][complexity]
         elif "openai" in self.provider or "gpt" in self.provider:
-            return self._call_openai_with_history(system_prompt, user_prompt, conversation_history)
+            model = self.model_tier['openai'][complexity]
         else:
-            return self._generate_mock_response(
+            yield from self._generate_mock_response(
                 customer_message, stress_analysis, fri_result, similar_cases, customer_data
             )
+            return
+        
+        # Sampling makes replays non-deterministic, so only exact-cache at temperature 0
+        key = None
+        if self.temperature == 0:
+            key = self._cache_key(system_prompt, user_prompt, conversation_history, model)
+            cached = self._cache_get(key)
+            if cached is not None:
+                logger.debug("Response cache hit")
+                yield cached
+                return
+        
+        # Paraphrased opening messages in the same financial state share an answer;
+        # follow-ups depend on the conversation so they are never served semantically
+        query = bucket = None
+        if not conversation_history:
+            query = self._embed(customer_message)
+            if query is not None:
+                bucket = self._semantic_bucket(customer_data, fri_result)
+                cached = self._semantic_get(query, bucket)
+                if cached is not None:
+                    logger.debug("Semantic cache hit")
+                    yield cached
+                    return
+        
+        self.last_error = None
+        outcome = {}
+        chunks = []
+        for chunk in self._call_with_fallback(system_prompt, user_prompt, conversation_history,
+                                              complexity, max_tokens, outcome):
+            chunks.append(chunk)
+            yield chunk
+        
+        # Never cache the connection-trouble fallback text
+        if not outcome.get('failed'):
+            response = "".join(chunks)
+            if key is not None:
+                self._cache_put(key, response)
+            if query is not None:
+                self._semantic_put(query, bucket, response)
+    
+    # ------------------------------------------------------------------
+    # Provider fallback chain
+    # ------------------------------------------------------------------
     
-    def _build_contextual_prompt(self, message, sentiment, stress, fri, cases, 
-                                 customer, history):
-        """Build prompt that accounts for conversation history"""
+    def _call_with_fallback(self, system_prompt, user_prompt, history, complexity,
+                            max_tokens=MAX_TOKENS_FIRST_TURN, outcome=None):
+        """
+        Stream from the selected provider, failing over to the other configured
+        one on rate limits, 5xx and timeouts. A provider can only be swapped
+        before its first chunk; providers with an open circuit are skipped.
         
-        weakest = min(fri['components'], key=lambda x: x['score'])
-        sentiment_scores = {k: v for k, v in sentiment.items() if k != 'dominant'}
-        max_confidence = max(sentiment_scores.values()) if sentiment_scores else 0.5
-        keywords_text = ', '.join(stress['detected_keywords']) if stress['detected_keywords'] else 'General financial stress'
+        outcome : dict, optional
+            Set to {'failed': True} when the connection-trouble text is yielded
+        """
+        primary = 'claude' if "claude" in self.provider else 'openai'
+        order = [primary] + [name for name in ('openai', 'claude') if name != primary]
+        calls = {'claude': self._call_claude_with_history, 'openai': self._call_openai_with_history}
         
-        # System prompt (doesn't change)
-        system_prompt = """You are Fiona, a compassionate financial coach at Snappi Bank, holding a PhD in Behavioral Economics and Finance. 
-
-Your coaching philosophy:
-- Build on previous conversation context naturally
-- Reference specific things the customer mentioned earlier
-- Show you're actively listening and remembering
-- Acknowledge progress or changes since last interaction
-- Be warm, personal, and genuinely helpful
-- Use behavioral economics principles and gentle nudges
-- Always sign off as "Take care,\\nFiona 💙\\nYour Financial Friend at Snappi"
-
-Important: DO NOT use ** for formatting. Use natural language emphasis instead."""
+        for name in order:
+            client = self.clients.get(name)
+            state = self.breaker[name]
+            if client is None or time.time() < state['open_until']:
+                continue
+            
+            started = False
+            try:
+                for chunk in calls[name](system_prompt, user_prompt, history,
+                                         self.model_tier[name][complexity], client, max_tokens):
+                    started = True
+                    yield chunk
+                state['fails'] = 0
+                self.last_error = None  # a failover that succeeded is not an error
+                return
+            except Exception as e:
+                error_msg = f"❌ {name} API Error: {str(e)}"
+                logger.warning(error_msg)
+                self.last_error = error_msg
+                if started or not self._is_transient(e):
+                    break
+                state['fails'] += 1
+                if state['fails'] >= CIRCUIT_FAIL_THRESHOLD:
+                    state['open_until'] = time.time() + CIRCUIT_COOLDOWN
+                    state['fails'] = 0
+                logger.info("Failing over from %s", name)
+        
+        if self.last_error is None:
+            self.last_error = "❌ No LLM provider available"
+        if outcome is not None:
+            outcome['failed'] = True
+        yield f"I'm having trouble connecting right now. Let me give you a quick response:\n\n" + self._generate_mock_response_simple()
+    
+    @staticmethod
+    def _is_transient(error):
+        """Rate limits, 5xx and connection/timeout errors are worth a failover"""
+        if not isinstance(error, (AnthropicAPIError, OpenAIAPIError)):
+            return False
+        status = getattr(error, 'status_code', None)
+        return status is None or status == 429 or status >= 500
+    
+    # ------------------------------------------------------------------
+    # Exact-match response cache
+    # ------------------------------------------------------------------
+    
+    def _cache_key(self, system_prompt, user_prompt, history, model):
+        """blake2b digest of everything that determines the completion"""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{system_prompt}|{user_prompt}|{model}|{self.temperature}".encode())
+        for m in history or ():
+            h.update(f"|{m['role']}:{m['content']}".encode())
+        return h.hexdigest()
+    
+    def _open_cache_db(self, cache_path):
+        """Open (and create if needed) the sqlite persistence layer"""
+        path = Path(cache_path).expanduser()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._cache_db = sqlite3.connect(str(path), check_same_thread=False)
+        self._cache_db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, response TEXT, ts INTEGER)"
+        )
+        self._cache_db.commit()
+    
+    def _cache_get(self, key):
+        response = self._response_cache.get(key)
+        if response is not None:
+            self._response_cache.move_to_end(key)
+            return response
+        
+        if self._cache_db is not None:
+            row = self._cache_db.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row:
+                self._remember(key, row[0])
+                return row[0]
+        return None
+    
+    def _cache_put(self, key, response):
+        self._remember(key, response)
+        if self._cache_db is not None:
+            self._cache_db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                (key, response, int(time.time()))
+            )
+            self._cache_db.commit()
+    
+    def _remember(self, key, response):
+        """Insert into the in-memory LRU, evicting the oldest entry when full"""
+        self._response_cache[key] = response
+        self._response_cache.move_to_end(key)
+        if len(self._response_cache) > self.cache_size:
+            self._response_cache.popitem(last=False)
+    
+    # ------------------------------------------------------------------
+    # Semantic response cache
+    # ------------------------------------------------------------------
+    
+    def _embed(self, text):
+        """Unit-norm float32 embedding, or None when no local embedder is available"""
+        if SentenceTransformer is None:
+            return None
+        if self._embedder is None:
+            self._embedder = SentenceTransformer(SEMANTIC_MODEL)
+        return self._embedder.encode(text, normalize_embeddings=True).astype(np.float32)
+    
+    def _semantic_bucket(self, customer, fri):
+        """Integer id for (customer, FRI decile) so answers never leak across
+        customers or very different financial states"""
+        decile = min(int(fri['total_score']) // 10, 9)
+        return self._sem_bucket_ids.setdefault((customer['name'], decile), len(self._sem_bucket_ids))
+    
+    def _semantic_get(self, query, bucket):
+        n = min(self._sem_count, self.semantic_cache_size)
+        if n == 0:
+            return None
+        
+        # Rows are unit-norm, so the dot product is the cosine similarity
+        sims = self._sem_vecs[:n] @ query
+        sims[self._sem_buckets[:n] != bucket] = -1.0
+        best = int(sims.argmax())
+        if sims[best] >= self.semantic_threshold:
+            return self._sem_responses[best]
+        return None
+    
+    def _semantic_put(self, query, bucket, response):
+        if self._sem_vecs is None:
+            self._sem_vecs = np.zeros((self.semantic_cache_size, query.shape[0]), dtype=np.float32)
+        slot = self._sem_count % self.semantic_cache_size
+        self._sem_vecs[slot] = query
+        self._sem_buckets[slot] = bucket
+        self._sem_responses[slot] = response
+        self._sem_count += 1
+    
+    def _compress_history(self, history, keep_last=6):
+        """
+        Keep the last `keep_last` turns verbatim and shrink everything older:
+        user turns to their first 200 chars, assistant turns to a one-line
+        "[coaching] ..." digest with the first euro amount and FRI gain.
+        Pure string work - no LLM call.
+        """
+        if len(history) <= keep_last:
+            return history
+        
+        cutoff = len(history) - keep_last
+        compressed = []
+        for m in history[:cutoff]:
+            content = m['content']
+            if content.startswith(SUMMARY_PREFIX):
+                pass  # already as short as it gets
+            elif m['role'] == 'assistant':
+                content = self._digest_reply(content)
+            else:
+                content = content[:200]
+            compressed.append({'role': m['role'], 'content': content})
+        compressed.extend(history[cutoff:])
+        return compressed
+    
+    @staticmethod
+    def _digest_reply(text):
+        """One-line summary of a coaching reply"""
+        lines = [l.strip() for l in text.splitlines() if l.strip()]
+        # Skip the "Hi Maria," greeting when there is anything after it
+        first = lines[1] if len(lines) > 1 and len(lines[0]) < 30 else (lines[0] if lines else "")
         
-        # Check if this is a follow-up question
-        is_followup = history and len(history) > 0
+        # Amounts in the action list, not the income recap in the opening
+        step = _FIRST_STEP_RE.search(text)
+        actions = text[step.start():] if step else text
         
-        if is_followup:
-            # For follow-up messages, provide context but keep prompt focused
-            user_prompt = f"""CURRENT CUSTOMER MESSAGE:
+        facts = []
+        euro = _EURO_RE.search(actions)
+        if euro:
+            facts.append(f"{euro.group(0)} action")
+        gain = _GAIN_RE.search(actions)
+        if gain:
+            facts.append(f"+{gain.group(1)} FRI")
+        else:
+            span = _FROM_TO_RE.search(actions)
+            if span:
+                facts.append(f"+{int(span.group(2)) - int(span.group(1))} FRI")
+        
+        digest = f"[coaching] {first[:80]}..."
+        if facts:
+            digest += f" ({' → '.join(facts)})"
+        return digest
+    
+    def _classify_complexity(self, message, stress, history):
+        """SIMPLE for short, low-stress follow-ups; COMPLEX otherwise"""
+        if (history and len(message) < 80
+                and str(stress.get('stress_level', '')).lower() == 'low'):
+            return SIMPLE
+        return COMPLEX
+    
+    def _prompt_followup(self, message, sentiment, stress, fri, cases, customer, complexity):
+        """Follow-up turn: only the current state; the history carries the rest"""
+        
+        weakest = weakest_component(fri)
+        keywords_text = ', '.join(stress['detected_keywords']) if stress['detected_keywords'] else 'General financial stress'
+        
+        # For follow-up messages, provide context but keep prompt focused
+        user_prompt = f"""CURRENT CUSTOMER MESSAGE:
 "{message}"
 
 CURRENT FINANCIAL STATE:
@@ -163,9 +669,21 @@ Review the conversation history above and provide a response that:
 
 Respond to {customer['name'].split()[0]} now:"""
         
-        else:
-            # First message - comprehensive analysis
-            user_prompt = f"""NEW CUSTOMER CONVERSATION
+        system_prompt = FIONA_SYSTEM_PROMPT_LITE if complexity == SIMPLE else FIONA_SYSTEM_PROMPT
+        return system_prompt, user_prompt, MAX_TOKENS_FOLLOWUP
+    
+    def _prompt_first(self, message, sentiment, stress, fri, cases, customer, complexity):
+        """First message - comprehensive analysis (always the full persona)"""
+        
+        weakest = weakest_component(fri)
+        sentiment_scores = {k: v for k, v in sentiment.items() if k != 'dominant'}
+        max_confidence = max(sentiment_scores.values()) if sentiment_scores else 0.5
+        keywords_text = ', '.join(stress['detected_keywords']) if stress['detected_keywords'] else 'General financial stress'
+        
+        cases_block = "\n".join(
+            f"• {c['case']['solution']} → {c['case']['improvement']}" for c in cases[:2]
+        )
+        user_prompt = f"""NEW CUSTOMER CONVERSATION
 
 CUSTOMER PROFILE:
 - Name: {customer['name']}
@@ -191,7 +709,7 @@ FINANCIAL RESILIENCE INDEX (FRI):
 ROOT CAUSE: {weakest['name']} is weakest at {weakest['score']:.0f}/100
 
 SIMILAR SUCCESS STORIES:
-{chr(10).join([f"• {case['case']['solution']} → {case['case']['improvement']}" for case in cases[:2]])}
+{cases_block}
 
 Generate a warm, empathetic response (300-400 words) that:
 1. Acknowledges their feelings genuinely
@@ -202,171 +720,300 @@ Generate a warm, empathetic response (300-400 words) that:
 
 Use euros (€), address them by first name, avoid jargon, be specific with numbers."""
         
-        return system_prompt, user_prompt
+        return FIONA_SYSTEM_PROMPT, user_prompt, MAX_TOKENS_FIRST_TURN
     
-    def _call_openai_with_history(self, system_prompt, user_prompt, history):
-        """Call OpenAI with conversation history"""
-        try:
-            messages = [{"role": "system", "content": system_prompt}]
-            
-            # Add conversation history
-            if history:
-                messages.extend(history)
-            
-            # Add current prompt
-            messages.append({"role": "user", "content": user_prompt})
-            
-            print(f"   📡 Sending {len(messages)} messages to OpenAI...")
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                max_tokens=1000,
-                temperature=0.7
-            )
-            
-            print("   ✅ Received response from OpenAI")
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            error_msg = f"❌ OpenAI API Error: {str(e)}"
-            print(error_msg)
-            self.last_error = error_msg
-            return f"I'm having trouble connecting right now. Let me give you a quick response:\n\n" + self._generate_mock_response_simple()
+    def _call_openai_with_history(self, system_prompt, user_prompt, history, model="gpt-4o-mini",
+                                  client=None, max_tokens=MAX_TOKENS_FIRST_TURN):
+        """Stream OpenAI completion with conversation history (errors propagate)"""
+        client = client or self.client
+        
+        # Leading system message never changes, so OpenAI's automatic
+        # prefix caching kicks in on every follow-up turn
+        messages = [{"role": "system", "content": system_prompt}]
+        
+        # Add conversation history
+        if history:
+            messages.extend(history)
+        
+        # Add current prompt
+        messages.append({"role": "user", "content": user_prompt})
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sending %d messages to OpenAI (%s)", len(messages), model)
+        
+        stream = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=self.temperature,
+            stream=True
+        )
+        
+        for chunk in stream:
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ""
+        
+        logger.debug("Received response from OpenAI")
     
-    def _call_claude_with_history(self, system_prompt, user_prompt, history):
-        """Call Claude with conversation history"""
-        try:
-            # Claude uses system parameter differently
-            messages = []
-            
-            # Add conversation history
-            if history:
-                messages.extend(history)
-            
-            # Add current prompt
-            messages.append({"role": "user", "content": user_prompt})
-            
-            print(f"   📡 Sending {len(messages)} messages to Claude...")
-            
-            response = self.client.messages.create(
-                model="claude-sonnet-4-20250514",
-                system=system_prompt,  # Claude uses system parameter
-                max_tokens=1000,
-                messages=messages
-            )
-            
-            print("   ✅ Received response from Claude")
-            return response.content[0].text
-            
-        except Exception as e:
-            error_msg = f"❌ Claude API Error: {str(e)}"
-            print(error_msg)
-            self.last_error = error_msg
-            return f"I'm having trouble connecting right now. Let me give you a quick response:\n\n" + self._generate_mock_response_simple()
+    def _call_claude_with_history(self, system_prompt, user_prompt, history,
+                                  model="claude-sonnet-4-20250514", client=None,
+                                  max_tokens=MAX_TOKENS_FIRST_TURN):
+        """Stream Claude completion with conversation history (errors propagate)"""
+        client = client or self.client
+        
+        # Claude uses system parameter differently
+        messages = []
+        
+        # Add conversation history, marking the last stable turn as a
+        # cache breakpoint so the whole prefix is reused next turn
+        if history:
+            messages.extend(history[:-1])
+            last = history[-1]
+            messages.append({
+                "role": last['role'],
+                "content": [{
+                    "type": "text",
+                    "text": last['content'],
+                    "cache_control": EPHEMERAL_CACHE
+                }]
+            })
+        
+        # Add current prompt
+        messages.append({"role": "user", "content": user_prompt})
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sending %d messages to Claude (%s)", len(messages), model)
+        
+        with client.messages.stream(
+            model=model,
+            system=[{
+                "type": "text",
+                "text": system_prompt,
+                "cache_control": EPHEMERAL_CACHE
+            }],  # Claude uses system parameter; cached across turns
+            max_tokens=max_tokens,
+            temperature=self.temperature,
+            stop_sequences=[SIGNOFF_STOP],
+            messages=messages
+        ) as stream:
+            yield from stream.text_stream
+            final = stream.get_final_message()
+        
+        # The API strips a matched stop sequence; put the sign-off line back
+        if final.stop_reason == "stop_sequence":
+            yield SIGNOFF_STOP
+        
+        logger.debug("Received response from Claude")
     
     def _generate_mock_response_simple(self):
         """Simple mock response for errors"""
         return "This is a demo response. The system is working, but I'm currently in demo mode."
     
     def _generate_mock_response(self, message, stress, fri, cases, customer):
-        """Generate contextual mock response (existing implementation)"""
+        """Generate contextual mock response, yielded line by line like a real stream"""
         
-        weakest = min(fri['components'], key=lambda x: x['score'])
+        weakest = weakest_component(fri)
+        components = fri['components']
+        essential = customer['avg_monthly_essential']
+        income = customer['avg_monthly_income']
+        total = fri['total_score']
         
-        response = f"""Hi {customer['name'].split()[0]},
-
-I can see why you're feeling this way, and I want you to know that what you're experiencing is completely valid. Looking at your financial situation, you've actually earned €{customer['avg_monthly_income']*12:.0f} this year - that's solid!
-
-However, I've identified the core issue: your {weakest['name']} score is {weakest['score']:.0f}/100, which is creating the uncertainty you're feeling. """
-
-        if weakest['name'] == 'Stability':
-            response += f"""Your income varies significantly month to month, making planning impossible.
-
-Here's what can help:
-
-1. Build a 4-month buffer (you're at {fri['components'][0]['score']/16.67:.1f} months now)
-   Target: Save €{customer['avg_monthly_essential']*2:.0f} over next 3 months
-
-2. Try our Income Smoother feature
-   Distributes earnings evenly across weeks
-   Reduces stress by 70%
-
-3. Consider income diversification
-   Add one steady stream (€{customer['avg_monthly_income']*0.2:.0f}/month)
-   Could improve Stability by +15 points
-
-Projected Impact: Your FRI could improve from {fri['total_score']:.0f} to {fri['total_score']+18:.0f} in 3 months.
-
-You're not failing - your situation just needs the right tools. Want to discuss this further?
-
-Take care,
-Fiona 💙
-Your Financial Friend at Snappi"""
-
-        elif weakest['name'] == 'Buffer':
-            response += f"""You have only {fri['components'][0]['score']/16.67:.1f} months of emergency savings, creating constant anxiety.
-
-Here's your action plan:
-
-1. Automate €{customer['avg_monthly_essential']*0.15:.0f}/month to savings
-   Set up now - adds €{customer['avg_monthly_essential']*0.15*12:.0f}/year
-
-2. Round-up savings
-   Every purchase rounds to €5, difference saved
-   Painless €{customer['avg_monthly_essential']*0.05:.0f}/month
-
-3. One-time boost
-   Review subscriptions - cancel €{customer['avg_monthly_essential']*0.1:.0f}
-   Next bonus goes to emergency fund
-
-These steps could improve Buffer from {fri['components'][0]['score']:.0f} to {fri['components'][0]['score']+25:.0f} in 6 months, raising FRI to {fri['total_score']+15:.0f}.
-
-Building security takes time, but every €10 counts. What questions do you have?
-
-Take care,
-Fiona 💙
-Your Financial Friend at Snappi"""
-
-        else:  # Momentum
-            response += f"""Your trajectory shows a slow decline over 3 months. Let's reverse this.
-
-Action steps:
-
-1. Spending audit this week
-   Review last month
-   Find €{customer['avg_monthly_essential']*0.1:.0f} unnecessary spending
-   Redirect to debt/savings
-
-2. Debt strategy
-   Focus on highest interest first
-   Extra €{customer['avg_monthly_essential']*0.15:.0f}/month = debt-free in 18 months vs 30
-
-3. Monthly FRI check-ins
-   Track progress
-   Celebrate wins
-   Adjust as needed
-
-Reversing momentum from {fri['components'][2]['score']:.0f} to {fri['components'][2]['score']+20:.0f} will raise FRI to {fri['total_score']+12:.0f} within 3 months.
-
-Starting is the hardest part. After that, progress motivates. Shall we tackle step 1 together?
-
-Take care,
-Fiona 💙
-Your Financial Friend at Snappi"""
-
-        return response
+        # Every number any variant interpolates, computed once
+        ctx = {
+            'first_name': customer['name'].split(None, 1)[0],
+            'yearly_income': income * 12,
+            'weakest_name': weakest['name'],
+            'weakest_score': weakest['score'],
+            'buffer_score': components[0]['score'],
+            'buffer_months': components[0]['score'] / 16.67,
+            'momentum_score': components[2]['score'],
+            'essential_x2': essential * 2,
+            'essential_15': essential * 0.15,
+            'essential_15_year': essential * 0.15 * 12,
+            'essential_10': essential * 0.1,
+            'essential_05': essential * 0.05,
+            'income_20': income * 0.2,
+            'total': total,
+            'total_12': total + 12,
+            'total_15': total + 15,
+            'total_18': total + 18,
+            'buffer_25': components[0]['score'] + 25,
+            'momentum_20': components[2]['score'] + 20,
+        }
+        template = _MOCK_TEMPLATES.get(weakest['name'], _MOCK_TEMPLATES['Momentum'])
+        
+        yield from template.format_map(ctx).splitlines(keepends=True)
     
     def estimate_tokens(self, text: str) -> int:
-        """Rough token estimation (4 chars ≈ 1 token)"""
-        return len(text) // 4
+        """Token count (o200k_base via tiktoken, else 4 chars ≈ 1 token)"""
+        n = self._token_memo.get(text)
+        if n is None:
+            enc = self._encoder()
+            n = len(enc.encode(text)) if enc is not None else len(text) // 4
+            self._remember_tokens([text], [n])
+        return n
+    
+    def count_message_tokens(self, messages: List[Dict]) -> List[int]:
+        """Per-message token counts; unseen contents are encoded in one batch"""
+        contents = [m.get('content', '') for m in messages]
+        known = {c: self._token_memo.get(c) for c in dict.fromkeys(contents)}
+        missing = [c for c, n in known.items() if n is None]
+        if missing:
+            enc = self._encoder()
+            if enc is not None:
+                counts = [len(tokens) for tokens in enc.encode_batch(missing)]
+            else:
+                counts = [len(c) // 4 for c in missing]
+            known.update(zip(missing, counts))
+            self._remember_tokens(missing, counts)
+        return [known[c] for c in contents]
+    
+    def _encoder(self):
+        """
+        o200k_base encoder, loaded on first use. A cold tiktoken cache downloads
+        the BPE file, so any load failure (e.g. offline) falls back to the
+        4-chars-per-token estimate instead of breaking the generator.
+        """
+        if not self._enc_loaded:
+            self._enc_loaded = True
+            if tiktoken is not None:
+                try:
+                    self._enc = tiktoken.get_encoding("o200k_base")
+                except Exception as e:
+                    logger.warning("tiktoken unavailable, estimating tokens: %s", e)
+        return self._enc
+    
+    def _remember_tokens(self, contents, counts):
+        # Bounded memo: start over rather than grow without limit
+        if len(self._token_memo) > 4096:
+            self._token_memo.clear()
+        self._token_memo.update(zip(contents, counts))
     
     def should_summarize_context(self, messages: List[Dict], model: str = "gpt-4o-mini") -> bool:
         """Check if conversation history should be summarized"""
         max_tokens = self.context_window_sizes.get(model, 8000)
         
-        total_chars = sum(len(m.get('content', '')) for m in messages)
-        estimated_tokens = total_chars // 4
+        estimated_tokens = sum(self.count_message_tokens(messages))
         
         # Use 70% of context window as threshold
         return estimated_tokens > (max_tokens * 0.7)
+    
+    def compress_history(self, history: List[Dict], budget: Optional[float] = None) -> List[Dict]:
+        """
+        Sliding window over the conversation: keep the newest turns that fit
+        in `budget` tokens (default: half the model's context window, at most
+        `max_window_messages` turns) and replace everything older with one
+        cumulative "[Context Summary]" assistant message.
+        
+        The boundary only moves in steps of `summary_fold_messages`, so the
+        verbatim part may run that many messages past the window before the
+        next batch of turns is folded (and the summary model called again).
+        """
+        if not history:
+            return history
+        if budget is None:
+            budget = 0.5 * self._context_window()
+        
+        # Walk backward until the budget or the message cap is exhausted
+        tokens = self.count_message_tokens(history)
+        used = 0
+        cutoff = len(history)
+        for i in range(len(history) - 1, -1, -1):
+            if len(history) - i > self.max_window_messages:
+                break
+            used += tokens[i]
+            if used > budget:
+                break
+            cutoff = i
+        
+        # Snap down to the fold step while the longer tail still fits
+        step = max(1, self.summary_fold_messages)
+        snapped = cutoff - cutoff % step
+        if snapped < cutoff and sum(tokens[snapped:]) <= budget:
+            cutoff = snapped
+        
+        if cutoff == 0:
+            return history
+        
+        summary = self._cumulative_summary(history, cutoff)
+        return [{'role': 'assistant', 'content': f"{SUMMARY_PREFIX} {summary}"}] + history[cutoff:]
+    
+    def _context_window(self):
+        kind = 'claude' if "claude" in self.provider else 'openai'
+        return self.context_window_sizes.get(self.model_tier[kind][COMPLEX], 8000)
+    
+    @staticmethod
+    def _digest_messages(messages):
+        h = hashlib.blake2b(digest_size=16)
+        for m in messages:
+            h.update(f"{m['role']}:{m['content']}|".encode())
+        return h.hexdigest()
+    
+    def _cumulative_summary(self, history, cutoff):
+        """
+        Summary of history[:cutoff]. Computed once per prefix; when the cutoff
+        only moved forward, the previous summary is extended with the newly
+        dropped turns instead of re-reading the whole prefix.
+        """
+        key = self._digest_messages(history[:cutoff])
+        summary = self._summary_cache.get(key)
+        if summary is not None:
+            return summary
+        
+        previous, start = None, 0
+        if self._rolling_summary is not None:
+            n, digest, text = self._rolling_summary
+            if n < cutoff and self._digest_messages(history[:n]) == digest:
+                previous, start = text, n
+        
+        summary = self._summarize_messages(history[start:cutoff], previous)
+        if summary is None:
+            # Provider failed - extractive fallback, not cached so we retry next turn
+            return self._extractive_summary(history[start:cutoff], previous)
+        
+        self._rolling_summary = (cutoff, key, summary)
+        self._summary_cache[key] = summary
+        if len(self._summary_cache) > 64:
+            self._summary_cache.popitem(last=False)
+        return summary
+    
+    def _summarize_messages(self, messages, previous=None):
+        """One short, non-streaming LLM call on the fast tier; None on failure"""
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        if previous:
+            transcript = f"Earlier summary: {previous}\n\n{transcript}"
+        
+        try:
+            if "claude" in self.provider:
+                response = self.client.messages.create(
+                    model=self.model_tier['claude'][SIMPLE],
+                    system=SUMMARY_INSTRUCTION,
+                    max_tokens=300,
+                    temperature=0,
+                    messages=[{"role": "user", "content": transcript}]
+                )
+                return response.content[0].text
+            
+            response = self.client.chat.completions.create(
+                model=self.model_tier['openai'][SIMPLE],
+                messages=[
+                    {"role": "system", "content": SUMMARY_INSTRUCTION},
+                    {"role": "user", "content": transcript}
+                ],
+                max_tokens=300,
+                temperature=0
+            )
+            return response.choices[0].message.content
+            
+        except Exception as e:
+            logger.warning("Summary call failed: %s", e)
+            return None
+    
+    def _extractive_summary(self, messages, previous=None):
+        parts = [previous] if previous else []
+        for m in messages:
+            if m['role'] == 'assistant':
+                parts.append(self._digest_reply(m['content']))
+            else:
+                parts.append(f"Customer: {m['content'][:200]}")
+        return " | ".join(parts)
@@ -1,8 +1,30 @@
+import functools
+import heapq
+import re
+from dataclasses import dataclass
 import numpy as np
 
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # optional - retrieval falls back to tag matching
+    SentenceTransformer = None
+
+@dataclass(frozen=True, slots=True)
+class Case:
+    """One solved case. Immutable; slots keep it small and attribute access fast."""
+    id: str
+    tags: frozenset
+    scenario: str
+    successful_advice: str
+
+    def __getitem__(self, key):
+        # Dict-style access for existing callers (case['scenario'], case['id'])
+        return getattr(self, key)
+
+
 # --- KNOWLEDGE BASE ---
 # A collection of "solved cases" to ground the AI's advice.
-CASE_LIBRARY = [
+_RAW_CASES = [
     {
         "id": "CASE_001",
         "tags": ["variable_income", "freelance", "anxiety"],
@@ -35,36 +57,93 @@ CASE_LIBRARY = [
     }
 ]
 
+CASE_LIBRARY = tuple(Case(**case | {'tags': frozenset(case['tags'])}) for case in _RAW_CASES)
+
+# --- TAG INDEX (built once at import) ---
+# Inverted index tag -> case indices, so scoring only touches the tags a
+# message actually mentions instead of every case x tag.
+TAG_INDEX = {}
+for _i, _case in enumerate(_RAW_CASES):
+    for _tag in _case['tags']:
+        TAG_INDEX.setdefault(_tag, []).append(_i)
+_CONTEXT_TAGS = frozenset(("travel", "rent"))
+_TOKEN_RE = re.compile(r"\w+")
+
+# --- EMBEDDING VIEW (built on first use) ---
+# Catches paraphrases tag matching misses ("housing costs" vs high_rent).
+# Unit-norm float16 rows: one matmul per query gives every cosine at once.
+CASE_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+CASE_MIN_SIMILARITY = 0.30
+
+
+@functools.lru_cache(maxsize=1)
+def _case_embedder():
+    """(model, case matrix) or None when sentence-transformers is unavailable."""
+    if SentenceTransformer is None:
+        return None
+    model = SentenceTransformer(CASE_EMBEDDING_MODEL)
+    texts = [c['scenario'] + ' ' + ' '.join(c['tags']) for c in _RAW_CASES]
+    embs = model.encode(texts, normalize_embeddings=True).astype(np.float16)
+    return model, embs
+
 def find_similar_cases(user_profile, current_fri, user_message):  # pending to see what are we going to do with the FRI in this part
     """
     Simple RAG Retriever (Keyword & Score Matching).
     Returns top 2 relevant cases.
     """
-    scores = []
-    
-    # Simple Keyword Extraction
-    message_lower = user_message.lower()
+    # Ranking depends only on the occupation and the message text, so it is
+    # memoized on those two strings — repeated questions skip the scan.
+    if _case_embedder() is not None:
+        ranked = _rank_cases_semantic(user_message.lower())
+    else:
+        ranked = _rank_cases(user_profile.get('occupation', '').lower(), user_message.lower())
+    return [CASE_LIBRARY[i] for i in ranked]
+
+
+@functools.lru_cache(maxsize=1024)
+def _rank_cases_semantic(message_lower):
+    """Indices of the top 2 cases by cosine similarity (>= CASE_MIN_SIMILARITY), best first."""
+    model, embs = _case_embedder()
+    q = model.encode(message_lower, normalize_embeddings=True)
+    sims = np.matmul(embs, q, dtype=np.float32)
     
-    for case in CASE_LIBRARY:
-        match_score = 0
-        
-        # 1. Tag Matching (Semantic-ish)
-        for tag in case['tags']:
-            if tag in message_lower:
-                match_score += 3
-            if tag in user_profile.get('occupation', '').lower():
-                match_score += 2
-                
-        # 2. Context Matching
-        if "travel" in message_lower and "travel" in case['tags']:
-            match_score += 5
-        if "rent" in message_lower and "rent" in case['tags']:
-            match_score += 5
-            
-        scores.append((match_score, case))
+    k = min(2, len(sims))
+    top = np.argpartition(-sims, k - 1)[:k]
+    top = top[np.argsort(-sims[top], kind='stable')]
+    return tuple(int(i) for i in top if sims[i] >= CASE_MIN_SIMILARITY)
+
+
+@functools.lru_cache(maxsize=4096)
+def _tags_for_token(token):
+    """Tags contained in a single word ("stressed", "distressed" -> "stress")."""
+    # Tags are all word characters, so a substring hit in the message always
+    # lies inside one \w+ token: per-token containment == the old substring test
+    return frozenset(tag for tag in TAG_INDEX if tag in token)
+
+
+def _mentioned_tags(text_lower):
+    tags = set()
+    for token in set(_TOKEN_RE.findall(text_lower)):
+        tags |= _tags_for_token(token)
+    return tags
+
+
+@functools.lru_cache(maxsize=1024)
+def _rank_cases(occupation_lower, message_lower):
+    """Indices of the top 2 matching CASE_LIBRARY entries (score > 0), best first."""
+    # Tokenize once; per tag: 3 if the message mentions it, 2 if the
+    # occupation does, plus 5 for the travel/rent context boost
+    message_tags = _mentioned_tags(message_lower)
+    occupation_tags = _mentioned_tags(occupation_lower)
     
-    # Sort by relevance and take top 2
-    scores.sort(key=lambda x: x[0], reverse=True)
+    scores = {}
+    for tag in message_tags | occupation_tags:
+        weight = 3 * (tag in message_tags) + 2 * (tag in occupation_tags)
+        if tag in message_tags and tag in _CONTEXT_TAGS:
+            weight += 5
+        for i in TAG_INDEX[tag]:
+            scores[i] = scores.get(i, 0) + weight
     
-    # Return only if score > 0
-    return [s[1] for s in scores if s[0] > 0][:2]
\ No newline at end of file
+    # Top 2 by relevance; candidates in library order so ties keep it
+    top = heapq.nlargest(2, sorted(scores), key=scores.__getitem__)
+    return tuple(i for i in top if scores[i] > 0)
@@ -1,6 +1,27 @@
+import functools
 import numpy as np
-import random
-from datetime import datetime, timedelta
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+from statistics import fmean
+
+try:
+    from pyarrow import feather
+except ImportError:  # optional - the history is then only memoized in-process
+    feather = None
+
+# On-disk cache of the generated history (regenerated once per day)
+CACHE_DIR = Path(__file__).parent / 'cache'
+LEDGER_CACHE = CACHE_DIR / 'george_ledger.feather'
+MONTHLY_CACHE = CACHE_DIR / 'george_monthly.feather'
+
+# Description pools for the randomly drawn ledger rows
+CONSULTING_DESCS = ('Research Grant', 'Consulting Fee', 'Book Royalties')
+ESSENTIAL_DESCS = ('Supermarket', 'Electricity', 'Internet', 'Petrol')
+DISC_DESCS = ('Academic Books', 'Dining Out', 'Coffee', 'Gadgets')
+
+# Academic conference season (calendar months)
+CONFERENCE_MONTHS = (5, 10)
 
 def get_customer_profiles():
     """
@@ -23,12 +44,73 @@ def get_customer_profiles():
 def get_transaction_history(customer_id):
     """
     Generate 5-year (60-month) granular transaction history EXCLUSIVELY for George.
+    The history is deterministic for a given day, so it is memoized in-process per
+    (customer, day) and persisted to data/cache as Feather (when pyarrow is
+    installed). The returned dict is shared between callers and must be treated
+    as read-only.
     """
+    # The day is part of the memo key: a long-running process picks up a fresh
+    # ledger after midnight instead of serving its start day's forever
+    return _history_for_day(customer_id, datetime.now().date())
+
+
+@functools.lru_cache(maxsize=4)
+def _history_for_day(customer_id, day):
+    """get_transaction_history for one calendar day (memoized)"""
     profiles = get_customer_profiles()
     
     # Force selection of George regardless of ID passed (since data must be ONLY mine)
     customer = list(profiles.values())[0]
+    today = np.datetime64(day)
+    
+    frames = _read_cached_history(today)
+    if frames is None:
+        frames = _generate_history(customer, today)
+        _write_cached_history(*frames)
+    ledger, monthly = frames
     
+    return {
+        'customer_id': customer['customer_id'],
+        'current_assets': round(float(monthly['assets'].iloc[-1]), 2),
+        'avg_monthly_essential': fmean(monthly['expenses'].tolist()[-12:]), 
+        'monthly_income': monthly['income'].tolist(),
+        'monthly_buffer': monthly['buffer'].tolist(),
+        'monthly_debt': monthly['debt'].tolist(),
+        'transactions_df': ledger  # Last 50 for context
+    }
+
+
+def _read_cached_history(today):
+    """Load (ledger, monthly) from the Feather cache if it was generated today."""
+    if feather is None or not (LEDGER_CACHE.exists() and MONTHLY_CACHE.exists()):
+        return None
+    try:
+        monthly = feather.read_feather(MONTHLY_CACHE)
+        if monthly['anchor'].iloc[-1] != today:
+            return None  # Dates are relative to "now" - stale after midnight
+        return feather.read_feather(LEDGER_CACHE), monthly
+    except (OSError, ValueError, KeyError):  # missing/corrupt file - regenerate
+        return None
+
+
+def _write_cached_history(ledger, monthly):
+    """Persist (ledger, monthly) to the Feather cache, best effort."""
+    if feather is None:
+        return
+    try:
+        CACHE_DIR.mkdir(exist_ok=True)
+        feather.write_feather(ledger, LEDGER_CACHE)
+        feather.write_feather(monthly, MONTHLY_CACHE)
+    except OSError:  # read-only deploys still get the in-process cache
+        pass
+
+
+def _generate_history(customer, today):
+    """
+    Build the ledger tail and the 60 monthly aggregates for one customer.
+    All 60 months are drawn in bulk into per-field arrays; only the tail of the
+    ledger that is actually returned is packed into the transactions DataFrame.
+    """
     # 2. Setup Parameters
     months = 60
     base_income = customer['avg_monthly_income']
@@ -36,130 +118,120 @@ def get_transaction_history(customer_id):
     rent = customer.get('rent', 1400)
     
     # Seed for consistency
-    np.random.seed(42) 
-    random.seed(42)
+    rng = np.random.default_rng(42)
     
-    # Storage
-    ledger = []
-    monthly_income_agg = []
-    monthly_expenses_agg = []
-    monthly_buffer_agg = []
-    monthly_debt_agg = []
+    month_idx = np.arange(months)
     
-    current_date = datetime.now()
+    # Month anchors, oldest first (30-day steps back from today)
+    anchors = today - (months - 1 - month_idx) * np.timedelta64(30, 'D')
+    calendar_month = anchors.astype('datetime64[M]').astype(int) % 12 + 1
     
     # Initial State (Solid starting point)
     liquid_assets = 5000 
-    current_debt = 0
-    
-    # 3. Generate Timeline (Past 60 Months)
-    for i in range(months):
-        month_offset = months - i - 1
-        month_date = current_date - timedelta(days=month_offset*30)
-        
-        # --- A. INCOME GENERATION ---
-        # 1. University Salary (Fixed Date: 25th)
-        salary_amt = base_income
-        ledger.append({
-            'date': (month_date + timedelta(days=25)).strftime("%Y-%m-%d"),
-            'description': 'University Payroll',
-            'amount': round(salary_amt, 2),
-            'type': 'inflow',
-            'category': 'Income'
-        })
-        
-        # 2. Occasional Consulting/Grants (Random: 30% chance per month)
-        consulting_amt = 0
-        if random.random() < 0.3:
-            consulting_amt = random.uniform(1000, 3000)
-            ledger.append({
-                'date': (month_date + timedelta(days=random.randint(5, 20))).strftime("%Y-%m-%d"),
-                'description': random.choice(['Research Grant', 'Consulting Fee', 'Book Royalties']),
-                'amount': round(consulting_amt, 2),
-                'type': 'inflow',
-                'category': 'Income'
-            })
-            
-        total_income = salary_amt + consulting_amt
-        monthly_income_agg.append(total_income)
-        
-        # --- B. EXPENSE GENERATION ---
-        total_expenses = 0
-        
-        # 1. Housing
-        ledger.append({
-            'date': (month_date + timedelta(days=1)).strftime("%Y-%m-%d"),
-            'description': 'Monthly Rent / Mortgage',
-            'amount': -rent,
-            'type': 'outflow',
-            'category': 'Housing'
-        })
-        total_expenses += rent
-        
-        # 2. Essentials (Stable)
-        essentials = (customer['avg_monthly_essential'] - rent) * random.uniform(0.95, 1.05)
-        num_tx = random.randint(6, 12)
-        for _ in range(num_tx):
-            amt = essentials / num_tx
-            ledger.append({
-                'date': (month_date + timedelta(days=random.randint(1, 28))).strftime("%Y-%m-%d"),
-                'description': random.choice(['Supermarket', 'Electricity', 'Internet', 'Petrol']),
-                'amount': -round(amt, 2),
-                'type': 'outflow',
-                'category': 'Essential'
-            })
-        total_expenses += essentials
-
-        # 3. Discretionary (Academic & Lifestyle)
-        # George spends ~40% of disposable income
-        disposable = max(0, total_income - total_expenses)
-        lifestyle_spend = disposable * random.uniform(0.3, 0.5)
-        
-        # Academic Conferences (Seasonal: May & October)
-        if month_date.month in [5, 10]:
-            lifestyle_spend += 800
-            ledger.append({
-                'date': (month_date + timedelta(days=15)).strftime("%Y-%m-%d"),
-                'description': 'Conference Travel / Accommodation',
-                'amount': -800,
-                'type': 'outflow',
-                'category': 'Travel'
-            })
-
-        num_disc = random.randint(3, 6)
-        for _ in range(num_disc):
-            amt = lifestyle_spend / (num_disc + 1) # Split remaining
-            ledger.append({
-                'date': (month_date + timedelta(days=random.randint(1, 28))).strftime("%Y-%m-%d"),
-                'description': random.choice(['Academic Books', 'Dining Out', 'Coffee', 'Gadgets']),
-                'amount': -round(amt, 2),
-                'type': 'outflow',
-                'category': 'Discretionary'
-            })
-        total_expenses += lifestyle_spend
-        monthly_expenses_agg.append(total_expenses)
-        
-        # --- C. BALANCE UPDATE ---
-        net_flow = total_income - total_expenses
-        liquid_assets += net_flow
-        
-        # Buffer Logic: George saves excess
-        # Buffer Score = (Assets / Avg_Essentials) * 16.67
-        avg_ess = np.mean(monthly_expenses_agg[-6:]) if len(monthly_expenses_agg) > 0 else total_expenses
-        buffer_score = min(100, (liquid_assets / (avg_ess + 1)) * 16.67)
-        
-        monthly_buffer_agg.append(buffer_score)
-        monthly_debt_agg.append(0) # George is debt-free in this scenario
-
-    # Sort ledger
-    ledger.sort(key=lambda x: x['date'])
+    
+    # --- A. INCOME GENERATION ---
+    # 1. University Salary (Fixed Date: 25th)
+    salary = np.full(months, float(base_income))
+    
+    # 2. Occasional Consulting/Grants (Random: 30% chance per month)
+    consulting_mask = rng.random(months) < 0.3
+    consulting = np.where(consulting_mask, rng.uniform(1000, 3000, months), 0.0)
+    consulting_months = np.flatnonzero(consulting_mask)
+    
+    monthly_income = salary + consulting
+    
+    # --- B. EXPENSE GENERATION ---
+    # 1. Housing + 2. Essentials (Stable)
+    essentials = (customer['avg_monthly_essential'] - rent) * rng.uniform(0.95, 1.05, months)
+    num_tx = rng.integers(6, 13, months)
+    
+    # 3. Discretionary (Academic & Lifestyle)
+    # George spends ~40% of disposable income
+    disposable = np.maximum(0, monthly_income - rent - essentials)
+    lifestyle_spend = disposable * rng.uniform(0.3, 0.5, months)
+    
+    # Academic Conferences (Seasonal: May & October)
+    conference_mask = np.isin(calendar_month, CONFERENCE_MONTHS)
+    lifestyle_spend += np.where(conference_mask, 800, 0)
+    conference_months = np.flatnonzero(conference_mask)
+    
+    num_disc = rng.integers(3, 7, months)
+    monthly_expenses = rent + essentials + lifestyle_spend
+    
+    # --- C. LEDGER ROWS (one array per field, in per-month insertion order) ---
+    ess_months = np.repeat(month_idx, num_tx)
+    disc_months = np.repeat(month_idx, num_disc)
+    n_consult, n_ess, n_conf, n_disc = len(consulting_months), len(ess_months), len(conference_months), len(disc_months)
+    
+    row_month = np.concatenate([month_idx, consulting_months, month_idx, ess_months, conference_months, disc_months])
+    row_day = np.concatenate([
+        np.full(months, 25),
+        rng.integers(5, 21, n_consult),
+        np.full(months, 1),
+        rng.integers(1, 29, n_ess),
+        np.full(n_conf, 15),
+        rng.integers(1, 29, n_disc),
+    ])
+    row_amount = np.concatenate([
+        np.round(salary, 2),
+        np.round(consulting[consulting_months], 2),
+        np.full(months, -float(rent)),
+        -np.round(essentials[ess_months] / num_tx[ess_months], 2),
+        np.full(n_conf, -800.0),
+        -np.round(lifestyle_spend[disc_months] / (num_disc[disc_months] + 1), 2),  # Split remaining
+    ])
+    row_description = np.concatenate([
+        np.full(months, 'University Payroll', dtype=object),
+        rng.choice(CONSULTING_DESCS, size=n_consult),
+        np.full(months, 'Monthly Rent / Mortgage', dtype=object),
+        rng.choice(ESSENTIAL_DESCS, size=n_ess),
+        np.full(n_conf, 'Conference Travel / Accommodation', dtype=object),
+        rng.choice(DISC_DESCS, size=n_disc),
+    ])
+    row_category = np.repeat(
+        np.array(['Income', 'Income', 'Housing', 'Essential', 'Travel', 'Discretionary'], dtype=object),
+        [months, n_consult, months, n_ess, n_conf, n_disc]
+    )
+    row_type = np.where(row_category == 'Income', 'inflow', 'outflow').astype(object)
+    
+    # --- D. BALANCE UPDATE ---
+    assets = liquid_assets + np.cumsum(monthly_income - monthly_expenses)
+    
+    # Buffer Logic: George saves excess
+    # Buffer Score = (Assets / Avg_Essentials) * 16.67, over a trailing 6-month mean
+    # (rolling sum from one prefix-sum pass: window = csum[i] - csum[i-6])
+    csum = np.cumsum(monthly_expenses)
+    rolling_sum = csum.copy()
+    rolling_sum[6:] -= csum[:-6]
+    avg_ess = rolling_sum / np.minimum(month_idx + 1, 6)
+    monthly_buffer = np.minimum(100, (assets / (avg_ess + 1)) * 16.67)
+    
+    # Take the last 50 rows in date order. Months never overlap, so only the
+    # trailing months that cover 50 rows need sorting (month*30 + day orders them)
+    rows_per_month = 2 + consulting_mask + num_tx + conference_mask + num_disc
+    first_month = months - 1 - np.searchsorted(np.cumsum(rows_per_month[::-1]), 50)
+    tail = np.flatnonzero(row_month >= first_month)
+    order = tail[np.argsort(row_month[tail] * 30 + row_day[tail], kind='stable')][-50:]
+    
+    # Dates as one datetime64[D] vector, formatted to ISO strings in bulk
+    row_date = (anchors[row_month[order]] + row_day[order].astype('timedelta64[D]')).astype(str)
+    
+    # Columnar ledger; the repeated strings are stored once as categoricals
+    ledger = pd.DataFrame({
+        'date': row_date,
+        'description': pd.Categorical(row_description[order]),
+        'amount': row_amount[order].astype(np.float32),
+        'type': pd.Categorical(row_type[order]),
+        'category': pd.Categorical(row_category[order])
+    })
 
-    return {
-        'customer_id': customer['customer_id'],
-        'current_assets': round(liquid_assets, 2),
-        'avg_monthly_essential': np.mean(monthly_expenses_agg[-12:]), 
-        'monthly_income': monthly_income_agg,
-        'monthly_buffer': monthly_buffer_agg,
-        'monthly_debt': monthly_debt_agg,
-        'transactions': ledger[-50:]  # Last 50 for context
-    }
\ No newline at end of file
+    monthly = pd.DataFrame({
+        'anchor': anchors,
+        'income': monthly_income,
+        'expenses': monthly_expenses,
+        'assets': assets,
+        'buffer': monthly_buffer,
+        'debt': np.zeros(months, dtype=int)  # George is debt-free in this scenario
+    })
+    
+    return ledger, monthly
\ No newline at end of file
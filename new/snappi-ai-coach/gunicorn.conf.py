@@ -0,0 +1,33 @@
+"""
+Gunicorn settings for the FIONA Flask app
+
+    gunicorn -c gunicorn.conf.py app_v1:app
+
+preload_app imports app_v1 (and loads FinBERT) once in the master; workers
+fork from it and share the model weights copy-on-write.
+
+Conversation sessions and the reply cache live in the worker process, so the
+default is one worker serving requests on threads. Raising FIONA_WORKERS
+splits a user's turns across workers with diverging histories unless session
+state is moved out of process.
+"""
+import os
+
+bind = os.getenv("FIONA_BIND", "127.0.0.1:5000")
+workers = int(os.getenv("FIONA_WORKERS", 1))
+threads = int(os.getenv("FIONA_THREADS", 8))
+worker_class = "gthread"
+preload_app = True
+timeout = 120  # LLM replies can take a while
+
+
+def post_fork(server, worker):
+    """Per-worker setup after fork from the preloaded master"""
+    import torch
+    from app_v1 import system
+    from models.inference_worker import InferenceWorker
+    
+    # Re-apply the TORCH_NUM_THREADS knob (default 1) in the forked worker
+    torch.set_num_threads(int(os.getenv("TORCH_NUM_THREADS", 1)))
+    # Threads do not survive fork: give each worker its own batching loop
+    system.worker = InferenceWorker(system.analyzer)
@@ -1,13 +1,15 @@
 """
 Models package for Snappi AI Financial Coach
-Contains FinBERT analyzer, FRI calculator, and LLM generator
+Contains FinBERT analyzer, FRI calculator, LLM generator, inference worker, and response cache
 """
 
 from .finbert_analyzer import FinBERTAnalyzer
 from .fri_calculator import FRICalculator
 from .llm_generator import LLMGenerator
+from .inference_worker import InferenceWorker
+from .response_cache import ResponseCache
 
-__all__ = ['FinBERTAnalyzer', 'FRICalculator', 'LLMGenerator']
+__all__ = ['FinBERTAnalyzer', 'FRICalculator', 'LLMGenerator', 'InferenceWorker', 'ResponseCache']
 
 # Version
 __version__ = '1.0.0'
\ No newline at end of file
@@ -2,20 +2,76 @@ from transformers import AutoTokenizer, AutoModelForSequenceClassification, Auto
 import torch
 import torch.nn.functional as F
 import numpy as np
+import os
+import threading
+from collections import OrderedDict
+
+# Inference only: no autograd anywhere, and a fixed intra-op thread count so
+# concurrent requests / gunicorn workers don't oversubscribe the cores
+# (override with TORCH_NUM_THREADS).
+torch.set_grad_enabled(False)
+torch.set_num_threads(int(os.getenv("TORCH_NUM_THREADS", 1)))
+try:
+    torch.set_num_interop_threads(1)
+except RuntimeError:
+    pass  # Already fixed once parallel work has started (e.g. module reload)
+
+# Dynamic-int8 ONNX export of FinBERT (see export_quantized_finbert).
+# Opt-in: point FINBERT_ONNX_DIR at the export to serve sentiment via ONNX Runtime.
+ONNX_QUANTIZED_FILE = "model_quantized.onnx"
+
+# Messages remembered by each of the sentiment / stress memos
+MEMO_SIZE = 2048
+
+
+def export_quantized_finbert(save_dir, model_name="ProsusAI/finbert"):
+    """
+    One-off: export FinBERT to ONNX and apply dynamic int8 quantization
+    (VNNI kernels on modern x86). Writes model_quantized.onnx + tokenizer
+    files into save_dir.
+    """
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    
+    model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+    model.save_pretrained(save_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(save_dir)
+    
+    quantizer = ORTQuantizer.from_pretrained(save_dir)
+    quantizer.quantize(save_dir=save_dir,
+                       quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False))
+    return save_dir
+
 
 class FinBERTAnalyzer:
     """Production-ready FinBERT analysis system with advanced stress detection"""
     
-    def __init__(self):
+    def __init__(self, onnx_dir=None):
         print("Loading FinBERT models...")
         self.tokenizer = AutoTokenizer.from_pretrained("ProsusAI/finbert")
-        self.sentiment_model = AutoModelForSequenceClassification.from_pretrained("ProsusAI/finbert")
-        self.embedding_model = AutoModel.from_pretrained("ProsusAI/finbert")
         
         # Move to GPU if available
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.sentiment_model.to(self.device)
-        self.embedding_model.to(self.device)
+        
+        # Sentiment: int8 ONNX Runtime session when an export is configured,
+        # otherwise the FP32 PyTorch model. Both return torch logits.
+        onnx_dir = onnx_dir or os.getenv("FINBERT_ONNX_DIR")
+        self.sentiment_model = self._load_onnx_sentiment(onnx_dir) if onnx_dir else None
+        if self.sentiment_model is None:
+            self.sentiment_model = AutoModelForSequenceClassification.from_pretrained("ProsusAI/finbert")
+            self.sentiment_model.to(self.device)
+            # Embeddings come from the same FinBERT encoder - one copy of the weights
+            self.embedding_model = self.sentiment_model.bert
+        else:
+            self.embedding_model = AutoModel.from_pretrained("ProsusAI/finbert")
+            self.embedding_model.to(self.device)
+        
+        # Keep CPU weights in shared memory: gunicorn workers forked from a
+        # preloaded master then read one copy instead of each faulting in their own
+        if self.device.type == 'cpu':
+            for module in {id(m): m for m in (self.sentiment_model, self.embedding_model)
+                           if isinstance(m, torch.nn.Module)}.values():
+                module.share_memory()
         
         # Comprehensive stress keyword patterns with severity weights
         self.stress_keywords = {
@@ -107,28 +163,140 @@ class FinBERTAnalyzer:
             'pension': 0.60, 'old age': 0.65,
         }
         
+        # Memoize inference per message: repeats ("hi", "yes", the same
+        # question twice) skip the transformer entirely. FinBERT's tokenizer
+        # is uncased, so sentiment is keyed on the stripped, lowercased text.
+        # Cached results are shared — treat them as read-only. Plain LRU dicts
+        # (not lru_cache) so analyze_batch can look up hits before batching.
+        self._sentiment_memo = OrderedDict()
+        self._stress_memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+        
         print(f"✅ FinBERT loaded on {self.device}")
     
+    def _load_onnx_sentiment(self, onnx_dir):
+        """Quantized ONNX Runtime sentiment model, or None if unavailable"""
+        try:
+            import onnxruntime as ort
+            from optimum.onnxruntime import ORTModelForSequenceClassification
+        except ImportError:
+            print("⚠️ optimum/onnxruntime not installed - using PyTorch FinBERT")
+            return None
+        
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = int(os.getenv("ORT_INTRA_OP_THREADS", os.cpu_count() or 1))
+        try:
+            model = ORTModelForSequenceClassification.from_pretrained(
+                onnx_dir, file_name=ONNX_QUANTIZED_FILE,
+                provider="CPUExecutionProvider", session_options=options)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not load {onnx_dir}/{ONNX_QUANTIZED_FILE} ({e}) - using PyTorch FinBERT")
+            return None
+        
+        # ONNX Runtime runs on CPU here; keep tokenized inputs there too
+        self.device = torch.device('cpu')
+        print("✅ FinBERT sentiment: int8 ONNX Runtime")
+        return model
+    
     def analyze_sentiment(self, text):
-        """Analyze financial sentiment using FinBERT"""
-        inputs = self.tokenizer(text, return_tensors="pt", padding=True, 
+        """Analyze financial sentiment using FinBERT (memoized per message)"""
+        key = text.strip().lower()
+        sentiment = self._memo_get(self._sentiment_memo, key)
+        if sentiment is None:
+            sentiment = self._memo_put(self._sentiment_memo, key, self._run_sentiment(key))
+        return sentiment
+    
+    def detect_stress(self, text):
+        """Context-aware stress detection (memoized per message) — see _run_stress"""
+        stress = self._memo_get(self._stress_memo, text)
+        if stress is None:
+            stress = self._memo_put(self._stress_memo, text, self._run_stress(text))
+        return stress
+    
+    def analyze(self, text):
+        """
+        Sentiment and stress for one message from a single FinBERT pass.
+        Stress scoring reads the sentiment computed here instead of
+        re-encoding the text.
+        
+        Returns (sentiment_result, stress_analysis)
+        """
+        sentiment = self.analyze_sentiment(text)
+        return sentiment, self.detect_stress(text)
+    
+    def analyze_batch(self, texts):
+        """
+        analyze() for several messages with one padded FinBERT forward pass
+        
+        Returns a list of (sentiment_result, stress_analysis), one per text
+        """
+        if len(texts) == 1:
+            return [self.analyze(texts[0])]
+        
+        # Memo hits first; only the misses go through the batched forward pass
+        sentiments = {}
+        for key in dict.fromkeys(t.strip().lower() for t in texts):
+            sentiments[key] = self._memo_get(self._sentiment_memo, key)
+        misses = [key for key, sentiment in sentiments.items() if sentiment is None]
+        if misses:
+            for key, sentiment in zip(misses, self._run_sentiment_batch(misses)):
+                sentiments[key] = self._memo_put(self._sentiment_memo, key, sentiment)
+        
+        results = []
+        for text in texts:
+            sentiment = sentiments[text.strip().lower()]
+            stress = self._memo_get(self._stress_memo, text)
+            if stress is None:
+                stress = self._memo_put(self._stress_memo, text, self._score_stress(text, sentiment))
+            results.append((sentiment, stress))
+        return results
+    
+    def _memo_get(self, memo, key):
+        """Memoized result for key (marked most recently used), or None"""
+        with self._memo_lock:
+            value = memo.get(key)
+            if value is not None:
+                memo.move_to_end(key)
+            return value
+    
+    def _memo_put(self, memo, key, value):
+        """Store value under key, evicting the least recently used past MEMO_SIZE; returns value"""
+        with self._memo_lock:
+            memo[key] = value
+            memo.move_to_end(key)
+            if len(memo) > MEMO_SIZE:
+                memo.popitem(last=False)
+        return value
+    
+    def _run_sentiment(self, text):
+        """FinBERT forward pass for one message"""
+        return self._run_sentiment_batch([text])[0]
+    
+    def _run_sentiment_batch(self, texts):
+        """FinBERT forward pass over a padded batch of messages"""
+        inputs = self.tokenizer(texts, return_tensors="pt", padding=True, 
                                truncation=True, max_length=512).to(self.device)
         
-        with torch.no_grad():
+        with torch.inference_mode():
             outputs = self.sentiment_model(**inputs)
-            predictions = torch.nn.functional.softmax(outputs.logits, dim=-1)
         
-        positive, negative, neutral = predictions[0].cpu().tolist()
+        # Softmax over the whole (batch, 3) logits block in NumPy
+        logits = outputs.logits.cpu().numpy()
+        probs = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        probs /= probs.sum(axis=-1, keepdims=True)
+        dominant = probs.argmax(axis=-1)
         
-        return {
-            'positive': positive,
-            'negative': negative,
-            'neutral': neutral,
-            'dominant': max(['positive', 'negative', 'neutral'], 
-                          key=lambda x: {'positive': positive, 'negative': negative, 'neutral': neutral}[x])
-        }
+        labels = ('positive', 'negative', 'neutral')
+        return [
+            {'positive': positive, 'negative': negative, 'neutral': neutral, 'dominant': labels[top]}
+            for (positive, negative, neutral), top in zip(probs.tolist(), dominant.tolist())
+        ]
     
-    def detect_stress(self, text):
+    def _run_stress(self, text):
+        """Stress analysis for one message, using its (memoized) sentiment"""
+        return self._score_stress(text, self.analyze_sentiment(text))
+    
+    def _score_stress(self, text, sentiment):
         """
         Advanced context-aware stress detection system
         
@@ -145,8 +313,7 @@ class FinBERTAnalyzer:
         
         text_lower = text.lower()
         
-        # Step 1: Get base sentiment from FinBERT
-        sentiment = self.analyze_sentiment(text)
+        # Step 1: Base sentiment from FinBERT (computed by the caller)
         negative_score = sentiment['negative']
         
         # Step 2: Detect multi-word stress phrases (highest priority)
@@ -403,7 +570,7 @@ class FinBERTAnalyzer:
         inputs = self.tokenizer(texts, return_tensors="pt", padding=True,
                                truncation=True, max_length=512).to(self.device)
         
-        with torch.no_grad():
+        with torch.inference_mode():
             outputs = self.embedding_model(**inputs)
             embeddings = outputs.last_hidden_state[:, 0, :]
             embeddings = F.normalize(embeddings, p=2, dim=1)
@@ -1,5 +1,14 @@
 import numpy as np
 from datetime import datetime, timedelta
+from operator import itemgetter
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional - the monthly kernel then runs as plain Python
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
 
 class FRICalculator:
     """Calculate Financial Resilience Index from transaction data"""
@@ -20,13 +29,16 @@ class FRICalculator:
                 self.w_stability * stability + 
                 self.w_momentum * momentum)
         
+        components = [
+            {'name': 'Buffer', 'score': buffer, 'weight': self.w_buffer},
+            {'name': 'Stability', 'score': stability, 'weight': self.w_stability},
+            {'name': 'Momentum', 'score': momentum, 'weight': self.w_momentum}
+        ]
+        
         return {
             'total_score': total,
-            'components': [
-                {'name': 'Buffer', 'score': buffer, 'weight': self.w_buffer},
-                {'name': 'Stability', 'score': stability, 'weight': self.w_stability},
-                {'name': 'Momentum', 'score': momentum, 'weight': self.w_momentum}
-            ],
+            'components': components,
+            'weakest': min(components, key=itemgetter('score')),  # so consumers don't each re-scan
             'interpretation': self._interpret_score(total),
             'assets': transactions['current_assets'],
             'buffer': buffer
@@ -97,31 +109,81 @@ class FRICalculator:
             return "Crisis - Urgent intervention needed"
     
     def calculate_monthly_fri(self, transactions):
-        """Calculate FRI for each of the last 12 months"""
-        monthly_scores = []
-        
-        for i in range(12):
-            month_data = self._get_month_data(transactions, i)
-            fri = self.calculate_fri(month_data)
-            
-            monthly_scores.append({
-                'month': f"Month {i+1}",
-                'total': fri['total_score'],
-                'buffer': fri['components'][0]['score'],
-                'stability': fri['components'][1]['score'],
-                'momentum': fri['components'][2]['score'],
-                'assets': month_data['current_assets']
-            })
-        
-        return monthly_scores
-    
-    def _get_month_data(self, transactions, month_index):
-        """Extract data for specific month"""
+        """
+        Calculate FRI for each of the last 12 months
+        
+        Returns a struct-of-arrays: one NumPy array per series, indexed by month
+        ('month', 'total', 'buffer', 'stability', 'momentum', 'assets')
+        """
+        months = 12
+        history = self.empty_history(months)
+        
         # This is simplified - in production, you'd filter actual transaction dates
-        return {
-            'current_assets': transactions['current_assets'] * (0.8 + 0.4 * np.random.random()),
-            'avg_monthly_essential': transactions['avg_monthly_essential'],
-            'monthly_income': transactions['monthly_income'][max(0, month_index-5):month_index+1],
-            'monthly_buffer': transactions['monthly_buffer'][:month_index+1],
-            'monthly_debt': transactions['monthly_debt'][:month_index+1]
-        }
\ No newline at end of file
+        history['assets'][:] = transactions['current_assets'] * (0.8 + 0.4 * np.random.random(months))
+        
+        (history['total'], history['buffer'],
+         history['stability'], history['momentum']) = _calc_monthly_fri_nb(
+            history['assets'],
+            float(transactions['avg_monthly_essential']),
+            np.asarray(transactions['monthly_income'], dtype=np.float64),
+            np.asarray(transactions['monthly_buffer'], dtype=np.float64),
+            np.asarray(transactions['monthly_debt'], dtype=np.float64),
+            self.w_buffer, self.w_stability, self.w_momentum
+        )
+        
+        return history
+    
+    @staticmethod
+    def empty_history(months=0):
+        """Zeroed monthly history arrays (months=0 gives the empty history)"""
+        history = {key: np.zeros(months) for key in ('total', 'buffer', 'stability', 'momentum', 'assets')}
+        history['month'] = np.array([f"Month {i+1}" for i in range(months)], dtype=str)
+        return history
+
+
+@njit(cache=True, fastmath=True)
+def _calc_monthly_fri_nb(assets, essential, income, buffer_hist, debt_hist,
+                         w_buffer, w_stability, w_momentum):
+    """
+    Monthly FRI kernel - same formulas as calculate_fri, applied to month i
+    with income[i-5:i+1] and buffer/debt history up to month i.
+    
+    Returns (total, buffer, stability, momentum) arrays
+    """
+    n = assets.shape[0]
+    total = np.empty(n)
+    buffer = np.empty(n)
+    stability = np.empty(n)
+    momentum = np.empty(n)
+    
+    for i in range(n):
+        # Buffer
+        if essential == 0:
+            buffer[i] = 100.0
+        else:
+            buffer[i] = min(100.0, (assets[i] / essential) * 16.67)
+        
+        # Stability (last 6 months of income)
+        lo = max(0, i - 5)
+        hi = min(i + 1, income.shape[0])
+        if hi - lo < 2:
+            stability[i] = 50.0
+        else:
+            window = income[lo:hi]
+            mean_income = window.mean()
+            if mean_income == 0:
+                stability[i] = 0.0
+            else:
+                cv = min(1.0, window.std() / mean_income)
+                stability[i] = 100.0 * (1.0 - cv)
+        
+        # Momentum (3-month deltas)
+        nb = min(i + 1, buffer_hist.shape[0])
+        delta_buffer = (buffer_hist[nb - 1] - buffer_hist[nb - 3]) / 3 if nb >= 3 else 0.0
+        nd = min(i + 1, debt_hist.shape[0])
+        delta_debt = -(debt_hist[nd - 1] - debt_hist[nd - 3]) / 3 if nd >= 3 else 0.0
+        momentum[i] = 50.0 + 50.0 * np.tanh(((delta_buffer + delta_debt) / 2) / 10)
+        
+        total[i] = w_buffer * buffer[i] + w_stability * stability[i] + w_momentum * momentum[i]
+    
+    return total, buffer, stability, momentum
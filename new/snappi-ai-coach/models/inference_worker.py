@@ -0,0 +1,75 @@
+"""
+Background inference worker for the Flask app
+
+An asyncio event loop runs on a daemon thread. Request threads hand FinBERT
+work to it and wait on the result, so messages that arrive within the same
+batch window are coalesced into one batched forward pass. LLM calls are not
+routed through here: the request thread would block on them either way.
+"""
+import asyncio
+import threading
+
+
+class InferenceWorker:
+    """asyncio bridge that batches FinBERT analysis across concurrent requests"""
+    
+    def __init__(self, analyzer, batch_window=0.010, max_batch=32):
+        """
+        Parameters:
+        -----------
+        analyzer : FinBERTAnalyzer
+            Provides analyze_batch(texts)
+        batch_window : float
+            Seconds to wait for more messages before running a batch
+        max_batch : int
+            Run the batch immediately once this many messages are queued
+        """
+        self.analyzer = analyzer
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.loop = asyncio.new_event_loop()
+        self._pending = []  # (text, future) waiting for the next batch
+        self._timer = None
+        self._thread = threading.Thread(target=self.loop.run_forever, name="inference-worker", daemon=True)
+        self._thread.start()
+    
+    def analyze(self, text):
+        """(sentiment_result, stress_analysis) for one message, via the batch queue"""
+        return asyncio.run_coroutine_threadsafe(self._enqueue(text), self.loop).result()
+    
+    def stop(self):
+        """Stop the event loop thread"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+    
+    async def _enqueue(self, text):
+        future = self.loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = self.loop.call_later(self.batch_window, self._flush)
+        return await future
+    
+    def _flush(self):
+        """Hand everything queued so far to one analyze_batch call"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self.loop.create_task(self._run_batch(batch))
+    
+    async def _run_batch(self, batch):
+        texts = [text for text, _ in batch]
+        try:
+            results = await self.loop.run_in_executor(None, self.analyzer.analyze_batch, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -1,32 +1,64 @@
 import os
-from google import genai
-from anthropic import Anthropic, AuthenticationError, NotFoundError, BadRequestError
-from openai import OpenAI
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# Seconds to wait for a provider's first chunk before hedging with the next one
+HEDGE_DELAY = 2.0
+# Extra seconds, after the last provider is started, to wait for any first
+# chunk; past that the cascade counts as failed and the mock reply is served
+HEDGE_TIMEOUT = 20.0
+
+# Claude model IDs, in order of preference. The first one that answers is
+# remembered (also across restarts) so later calls skip the probing.
+CLAUDE_MODELS = (
+    "claude-3-5-sonnet-latest", "claude-3-5-sonnet-20241022",
+    "claude-3-opus-20240229", "claude-3-sonnet-20240229", "claude-3-haiku-20240307"
+)
+CLAUDE_MODEL_CACHE = Path.home() / ".cache" / "fiona" / "claude_model"
+
+# Character budget for the conversation section of the prompt (newest kept)
+MAX_HISTORY_CHARS = 2000
+
 class LLMGenerator:
     """
     Multi-provider LLM Generator with Fallback Logic + RAG/CAG
     Priority: Gemini (google.genai) -> Claude -> OpenAI
     """
     
+    # One client attribute and one status flag per provider
+    __slots__ = (
+        'gemini', 'claude', 'openai', 'gemini_ok', 'claude_ok', 'openai_ok',
+        '_hedge_pool', '_context_cache', '_claude_model', '_claude_model_errors'
+    )
+    
     def __init__(self):
-        self.clients = {}
-        self.provider_status = {
-            "gemini": False,
-            "claude": False,
-            "openai": False
-        }
+        self.gemini = self.claude = self.openai = None
+        self.gemini_ok = self.claude_ok = self.openai_ok = False
+        # Provider streams are opened here, so a hedged-out provider still
+        # waiting for its first chunk never blocks the request thread
+        self._hedge_pool = ThreadPoolExecutor(max_workers=6, thread_name_prefix="llm-hedge")
+        # (name, occupation, FRI score, id(ledger)) -> (ledger, static prompt context)
+        self._context_cache = {}
+        self._claude_model = self._load_claude_model()
+        # Claude errors that mean "try the next model ID"; set once anthropic is imported
+        self._claude_model_errors = ()
     
     def setup_providers(self, secrets):
-        """Initialize all available providers from secrets dict"""
+        """
+        Initialize all available providers from secrets dict.
+        Each SDK is imported only when its key is configured.
+        """
         print("\n🔧 CONFIGURING LLM PROVIDERS...")
 
         # 1. Setup Gemini (Primary)
         if secrets.get("GEMINI_API_KEY"):
             try:
-                self.clients['gemini'] = genai.Client(api_key=secrets["GEMINI_API_KEY"])
-                self.provider_status['gemini'] = True
+                from google import genai
+                self.gemini = genai.Client(api_key=secrets["GEMINI_API_KEY"])
+                self.gemini_ok = True
                 print("   ✅ Gemini Connected (Primary)")
             except Exception as e:
                 print(f"   ❌ Gemini Error: {e}")
@@ -34,8 +66,10 @@ class LLMGenerator:
         # 2. Setup Claude (Secondary)
         if secrets.get("ANTHROPIC_API_KEY"):
             try:
-                self.clients['claude'] = Anthropic(api_key=secrets["ANTHROPIC_API_KEY"])
-                self.provider_status['claude'] = True
+                from anthropic import Anthropic, NotFoundError, BadRequestError
+                self._claude_model_errors = (NotFoundError, BadRequestError)
+                self.claude = Anthropic(api_key=secrets["ANTHROPIC_API_KEY"])
+                self.claude_ok = True
                 print("   ✅ Claude Connected (Fallback 1)")
             except Exception as e:
                 print(f"   ❌ Claude Error: {e}")
@@ -43,8 +77,9 @@ class LLMGenerator:
         # 3. Setup OpenAI (Tertiary)
         if secrets.get("OPENAI_API_KEY"):
             try:
-                self.clients['openai'] = OpenAI(api_key=secrets["OPENAI_API_KEY"])
-                self.provider_status['openai'] = True
+                from openai import OpenAI
+                self.openai = OpenAI(api_key=secrets["OPENAI_API_KEY"])
+                self.openai_ok = True
                 print("   ✅ OpenAI Connected (Fallback 2)")
             except Exception as e:
                 print(f"   ❌ OpenAI Error: {e}")
@@ -58,26 +93,101 @@ class LLMGenerator:
         # Build the "Mega-Prompt" with all context
         prompt = self._build_prompt(customer_message, sentiment_result, stress_analysis, fri_result, similar_cases, customer_data, chat_history)
         
-        # --- FALLBACK LOGIC ---
-        if self.provider_status['gemini']:
-            try:
-                return self._call_gemini(prompt)
-            except Exception as e:
-                print(f"   ⚠️ Gemini Failed: {str(e)[:50]}... Switching...")
+        # --- FALLBACK LOGIC (hedged) ---
+        reply = list(self._hedged_stream(prompt))
+        if reply:
+            return "".join(reply)
 
-        if self.provider_status['claude']:
-            try:
-                return self._call_claude(prompt)
-            except Exception as e:
-                print(f"   ⚠️ Claude Failed: {str(e)[:50]}... Switching...")
+        return self._generate_mock_response(customer_data)
+
+    def generate_coaching_stream(self, customer_message, sentiment_result,
+                                stress_analysis, fri_result, similar_cases, customer_data, chat_history=""):
+        """
+        Streaming variant of generate_coaching: yields the reply as text chunks
+        while the provider generates it. Same hedged fallback cascade.
+        """
+        prompt = self._build_prompt(customer_message, sentiment_result, stress_analysis, fri_result, similar_cases, customer_data, chat_history)
+        
+        started = False
+        for chunk in self._hedged_stream(prompt):
+            started = True
+            yield chunk
+        if not started:
+            yield self._generate_mock_response(customer_data)
 
-        if self.provider_status['openai']:
+    def _hedged_stream(self, prompt):
+        """
+        Hedged fallback cascade over the streaming calls. The next provider is
+        started as soon as the current one fails, or once it has produced no
+        chunk for HEDGE_DELAY seconds; the first provider to produce a chunk
+        wins and is streamed through. A losing stream is closed (ending its
+        request) when its first chunk arrives - a blocked SDK call cannot be
+        interrupted before that. Yields nothing if every provider failed or
+        none produced a chunk within HEDGE_DELAY per provider + HEDGE_TIMEOUT.
+        """
+        cascade = [
+            (label, stream) for ok, label, stream in (
+                (self.gemini_ok, 'Gemini', self._stream_gemini),
+                (self.claude_ok, 'Claude', self._stream_claude),
+                (self.openai_ok, 'OpenAI', self._stream_openai),
+            ) if ok
+        ]
+        arrivals = queue.Queue()  # (label, first chunk, rest) or (label, None, error)
+        lock = threading.Lock()
+        decided = []  # non-empty once the race is over; late arrivals close themselves
+        
+        def open_stream(label, stream):
             try:
-                return self._call_openai(prompt)
+                chunks = stream(prompt)
+                first = next(chunks, "")
             except Exception as e:
-                print(f"   ⚠️ OpenAI Failed: {str(e)[:50]}...")
-
-        return self._generate_mock_response(customer_data)
+                arrivals.put((label, None, e))
+                return
+            with lock:
+                if decided:
+                    chunks.close()
+                else:
+                    arrivals.put((label, first, chunks))
+        
+        winner, pending = None, 0
+        deadline = time.monotonic() + HEDGE_DELAY * len(cascade) + HEDGE_TIMEOUT
+        try:
+            while winner is None and (cascade or pending):
+                if cascade:
+                    self._hedge_pool.submit(open_stream, *cascade.pop(0))
+                    pending += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print("   ⚠️ No provider answered in time. Using the offline reply...")
+                    break
+                try:
+                    label, first, rest = arrivals.get(timeout=min(HEDGE_DELAY, remaining) if cascade else remaining)
+                except queue.Empty:
+                    continue  # no first chunk yet - hedge with the next provider
+                pending -= 1
+                if first is None:
+                    print(f"   ⚠️ {label} Failed: {str(rest)[:50]}... Switching...")
+                else:
+                    winner = (label, first, rest)
+        finally:
+            with lock:
+                decided.append(True)
+                while not arrivals.empty():
+                    _, first, rest = arrivals.get_nowait()
+                    if first is not None:
+                        rest.close()
+        
+        if winner is None:
+            return
+        label, first, rest = winner
+        try:
+            yield first
+            yield from rest
+        except Exception as e:
+            # Part of the reply is already out - end it here
+            print(f"   ⚠️ {label} Failed mid-reply: {str(e)[:50]}...")
+        finally:
+            rest.close()
 
     def generate_audio_response(self, text_response):
         """Audio generation is DISABLED per user requirement."""
@@ -85,75 +195,96 @@ class LLMGenerator:
 
     # --- INTERNAL CALLS ---
 
-    def _call_gemini(self, prompt):
-        response = self.clients['gemini'].models.generate_content(
+    def _claude_candidates(self):
+        """CLAUDE_MODELS, with the remembered working model tried first"""
+        if self._claude_model is None:
+            return CLAUDE_MODELS
+        return (self._claude_model,) + tuple(m for m in CLAUDE_MODELS if m != self._claude_model)
+
+    @staticmethod
+    def _load_claude_model():
+        """Working model ID persisted by a previous run, if any"""
+        try:
+            return CLAUDE_MODEL_CACHE.read_text().strip() or None
+        except OSError:
+            return None
+
+    def _remember_claude_model(self, model_id):
+        """Memoize model_id as the working Claude model (in-process and on disk)"""
+        if model_id == self._claude_model:
+            return
+        self._claude_model = model_id
+        try:
+            CLAUDE_MODEL_CACHE.parent.mkdir(parents=True, exist_ok=True)
+            CLAUDE_MODEL_CACHE.write_text(model_id)
+        except OSError:  # read-only home - still remembered for this process
+            pass
+
+    # --- STREAMING CALLS (yield text deltas) ---
+
+    def _stream_gemini(self, prompt):
+        for chunk in self.gemini.models.generate_content_stream(
             model='gemini-2.0-flash', 
-            contents=prompt
-        )
-        return response.text
-
-    def _call_claude(self, prompt):
-        # Tries multiple Claude model IDs
-        models_to_try = [
-            "claude-3-5-sonnet-latest", "claude-3-5-sonnet-20241022",
-            "claude-3-opus-20240229", "claude-3-sonnet-20240229", "claude-3-haiku-20240307"
-        ]
-        for model_id in models_to_try:
+            contents="".join(prompt)
+        ):
+            if chunk.text:
+                yield chunk.text
+
+    def _stream_claude(self, prompt):
+        for model_id in self._claude_candidates():
             try:
-                msg = self.clients['claude'].messages.create(
+                with self.claude.messages.stream(
                     model=model_id, max_tokens=300,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                return msg.content[0].text
-            except (NotFoundError, BadRequestError): continue
-            except Exception as e: raise e
+                    messages=[{"role": "user", "content": self._claude_content(prompt)}]
+                ) as stream:
+                    self._remember_claude_model(model_id)
+                    yield from stream.text_stream
+                return
+            except self._claude_model_errors: continue
         raise Exception("No working Claude model found.")
 
-    def _call_openai(self, prompt):
-        response = self.clients['openai'].chat.completions.create(
+    def _stream_openai(self, prompt):
+        with self.openai.chat.completions.create(
             model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return response.choices[0].message.content
+            messages=[{"role": "user", "content": "".join(prompt)}],
+            stream=True
+        ) as stream:  # closing the generator closes the HTTP response
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
 
     # --- UPDATED PROMPT: Explicit History Section ---
     def _build_prompt(self, message, sentiment, stress, fri, similar_cases, customer, chat_history):
+        """
+        Returns the prompt as (context, turn). The context block only depends on
+        the profile and the FRI result (with its ledger), so it is reused across
+        turns and sent first, where providers can cache it as a prefix. The turn
+        block carries everything that changes per message.
+        """
         
-        # 1. RAG Context
+        # 1. RAG Context (retrieved per message)
         rag_context = ""
         if similar_cases:
-            rag_context = "RELEVANT PAST CASES (GUIDANCE):\n"
-            for case in similar_cases:
-                rag_context += f"- Scenario: {case['scenario']}\n  Proven Strategy: {case['successful_advice']}\n"
+            rag_context = "RELEVANT PAST CASES (GUIDANCE):\n" + "".join(
+                f"- Scenario: {case['scenario']}\n  Proven Strategy: {case['successful_advice']}\n"
+                for case in similar_cases
+            )
         else:
             rag_context = "NO SIMILAR PAST CASES FOUND."
-
-        # 2. CAG Context (Transaction Ledger)
-        all_tx = fri.get('transactions', [])
-        recent_tx = all_tx[-15:] if len(all_tx) > 15 else all_tx
-        
-        tx_str = ""
-        for t in recent_tx:
-            cat = t.get('category', 'General')
-            tx_str += f"- {t['date']} [{cat}]: {t['description']} ({t['amount']}€)\n"
         
-        # 3. Mappings
+        # 2. Mappings
         dom_emotion = sentiment.get('dominant', 'neutral')
         dom_score = sentiment.get(dom_emotion, 0.0) 
         stress_lvl = stress.get('stress_level', 'LOW')
         is_stressed = "YES" if stress_lvl in ["HIGH", "MODERATE"] else "NO"
         
-        return f"""
-        [ROLE]
-        You are Fiona, an advanced financial coach driven by behavioral economics.
-        
-        [CAG: FINANCIAL CONTEXT]
-        User: {customer['name']} ({customer['occupation']})
-        (Internal Context Only): FRI Score: {fri['total_score']:.0f}/100
-        
-        [CAG: RECENT TRANSACTION LEDGER]
-        {tx_str}
+        # 3. Conversation, trimmed to the budget at a line boundary
+        if len(chat_history) > MAX_HISTORY_CHARS:
+            tail = chat_history[-MAX_HISTORY_CHARS:]
+            cut = tail.find("\n")
+            chat_history = tail[cut + 1:] if cut != -1 else tail
         
+        turn = f"""
         [EMOTIONAL STATE]
         Emotion: {dom_emotion} (Confidence: {dom_score:.2f})
         Stress Detected: {is_stressed} ({stress_lvl})
@@ -165,6 +296,35 @@ class LLMGenerator:
         
         [CURRENT USER MESSAGE]
         "{message}"
+        """
+        return self._static_context(customer, fri), turn
+
+    def _static_context(self, customer, fri):
+        """[ROLE] + CAG + [INSTRUCTIONS] block, built once per (profile, FRI result)"""
+        tx_df = fri.get('transactions_df')
+        key = (customer['name'], customer['occupation'], fri['total_score'], id(tx_df))
+        hit = self._context_cache.get(key)
+        if hit is not None and hit[0] is tx_df:  # identity check guards against id() reuse
+            return hit[1]
+        
+        # CAG Context (Transaction Ledger)
+        tx_str = ""
+        if tx_df is not None:
+            tx_str = "".join(
+                f"- {t.date} [{t.category}]: {t.description} ({t.amount:.2f}€)\n"
+                for t in tx_df.tail(15).itertuples(index=False)
+            )
+        
+        context = f"""
+        [ROLE]
+        You are Fiona, an advanced financial coach driven by behavioral economics.
+        
+        [CAG: FINANCIAL CONTEXT]
+        User: {customer['name']} ({customer['occupation']})
+        (Internal Context Only): FRI Score: {fri['total_score']:.0f}/100
+        
+        [CAG: RECENT TRANSACTION LEDGER]
+        {tx_str}
         
         [INSTRUCTIONS]
         1. **Context Awareness**: Read the [CONVERSATION CONTEXT]. If you have already answered a question, do not repeat the full explanation. Just acknowledge it and move forward.
@@ -180,6 +340,19 @@ class LLMGenerator:
         11. Reply in normal, comforting sentences, warm, and mother-like. Be empathetic but professional.
         12. Analyze the FRI index if asked for. FRI Score: {fri['total_score']:.0f}/100
         """
+        if len(self._context_cache) >= 16:
+            self._context_cache.clear()
+        self._context_cache[key] = (tx_df, context)
+        return context
+
+    @staticmethod
+    def _claude_content(prompt):
+        """Claude content blocks; the static context is marked for prompt caching"""
+        context, turn = prompt
+        return [
+            {"type": "text", "text": context, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": turn}
+        ]
 
     def _generate_mock_response(self, customer):
         return f"System Offline. But I know you are {customer['name']}."
@@ -0,0 +1,60 @@
+"""
+Exact-match cache for coaching replies
+
+Key: sha1 of (normalized message, FRI bucket, retrieved case ids, recent
+conversation). The conversation is part of the key, so a short follow-up
+("yes", "tell me more") is only replayed within the same exchange.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of LLM coaching replies"""
+    
+    def __init__(self, max_entries=1024, fri_bucket=10):
+        """
+        Parameters:
+        -----------
+        max_entries : int
+            Replies kept before the least recently used are evicted
+        fri_bucket : int
+            FRI points per context bucket
+        """
+        self.max_entries = max_entries
+        self.fri_bucket = fri_bucket
+        self._replies = OrderedDict()  # sha1 -> reply, least recently used first
+        self._lock = threading.Lock()  # gthread workers share one cache
+    
+    def context(self, fri_score, similar_cases, history=""):
+        """Part of the key besides the message: FRI bucket + retrieved case ids + history digest"""
+        return (
+            int(fri_score // self.fri_bucket),
+            tuple(case['id'] for case in similar_cases),
+            hashlib.sha1(history.encode('utf-8')).hexdigest()
+        )
+    
+    def get(self, message, context):
+        """Cached reply for this turn, or None"""
+        key = self._key(message, context)
+        with self._lock:
+            reply = self._replies.get(key)
+            if reply is not None:
+                self._replies.move_to_end(key)
+        return reply
+    
+    def put(self, message, context, reply):
+        """Store a reply, evicting the least recently used beyond max_entries"""
+        key = self._key(message, context)
+        with self._lock:
+            self._replies[key] = reply
+            self._replies.move_to_end(key)
+            while len(self._replies) > self.max_entries:
+                self._replies.popitem(last=False)
+    
+    @staticmethod
+    def _key(message, context):
+        fri, case_ids, history = context
+        raw = f"{message.strip().lower()}|{fri}|{','.join(case_ids)}|{history}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
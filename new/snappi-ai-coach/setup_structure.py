@@ -1,49 +1,14 @@
 """
 Script to create the complete directory structure
 """
-import os
+import sys
 from pathlib import Path
 
-def create_directory_structure():
-    """Create all necessary directories and files"""
-    
-    # Base directories
-    directories = [
-        'models',
-        'data',
-        'utils',
-        'assets',
-        'tests',
-        'logs'
-    ]
-    
-    print("📁 Creating directory structure...")
-    
-    for directory in directories:
-        Path(directory).mkdir(exist_ok=True)
-        print(f"✅ Created: {directory}/")
-        
-        # Create __init__.py for Python packages
-        if directory in ['models', 'data', 'utils']:
-            init_file = Path(directory) / '__init__.py'
-            if not init_file.exists():
-                init_file.touch()
-                print(f"✅ Created: {init_file}")
-    
-    # Create config.py if it doesn't exist
-    if not Path('config.py').exists():
-        print("⚠️  config.py not found - please create it")
-    
-    # Create styles.css if it doesn't exist
-    styles_path = Path('assets') / 'styles.css'
-    if not styles_path.exists():
-        print("⚠️  assets/styles.css not found - please create it")
-    
-    # Create .gitignore
-    gitignore_path = Path('.gitignore')
-    if not gitignore_path.exists():
-        with open(gitignore_path, 'w') as f:
-            f.write("""# Python
+# Base directories, and the ones that are Python packages
+DIRECTORIES = ('models', 'data', 'utils', 'assets', 'tests', 'logs')
+PACKAGES = ('models', 'data', 'utils')
+
+_GITIGNORE = b"""# Python
 __pycache__/
 *.py[cod]
 *$py.class
@@ -75,14 +40,45 @@ Thumbs.db
 
 # Streamlit
 .streamlit/secrets.toml
-""")
-        print("✅ Created: .gitignore")
+"""
+
+def create_directory_structure():
+    """Create all necessary directories and files"""
+    
+    # Collected and written in one go at the end
+    out = ["📁 Creating directory structure...\n"]
+    
+    for directory in DIRECTORIES:
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        out.append(f"✅ Created: {directory}/\n")
+    
+    # Create __init__.py for Python packages
+    for package in PACKAGES:
+        init_file = Path(package) / '__init__.py'
+        if not init_file.exists():
+            init_file.touch()
+            out.append(f"✅ Created: {init_file}\n")
+    
+    # Create config.py if it doesn't exist
+    if not Path('config.py').exists():
+        out.append("⚠️  config.py not found - please create it\n")
+    
+    # Create styles.css if it doesn't exist
+    if not (Path('assets') / 'styles.css').exists():
+        out.append("⚠️  assets/styles.css not found - please create it\n")
+    
+    # Create .gitignore
+    gitignore_path = Path('.gitignore')
+    if not gitignore_path.exists():
+        gitignore_path.write_bytes(_GITIGNORE)
+        out.append("✅ Created: .gitignore\n")
     
-    print("\n✨ Directory structure created successfully!")
-    print("\n📋 Next steps:")
-    print("1. Ensure all .py files are in their correct directories")
-    print("2. Run: python setup_structure.py")
-    print("3. Run: streamlit run app.py")
+    out.append("\n✨ Directory structure created successfully!\n")
+    out.append("\n📋 Next steps:\n")
+    out.append("1. Ensure all .py files are in their correct directories\n")
+    out.append("2. Run: python setup_structure.py\n")
+    out.append("3. Run: streamlit run app.py\n")
+    sys.stdout.writelines(out)
 
 if __name__ == "__main__":
     create_directory_structure()
\ No newline at end of file
@@ -2,7 +2,7 @@ import streamlit as st
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Custom imports
 from models.finbert_analyzer import FinBERTAnalyzer
@@ -11,6 +11,7 @@ from models.llm_generator import LLMGenerator
 from data.mock_data import get_customer_profiles, get_transaction_history
 from utils.visualizations import create_fri_gauge, create_timeline_chart, create_component_radar
 from utils.prompts import create_coaching_prompt
+from config import CACHE_TTL
 
 # Page configuration - MUST BE FIRST
 st.set_page_config(
@@ -113,13 +114,39 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize session state
-if 'analyzer' not in st.session_state:
-    with st.spinner('🚀 Loading AI and FRI models...'):
-        st.session_state.analyzer = FinBERTAnalyzer()
-        st.session_state.fri_calc = FRICalculator()
-        st.session_state.llm = LLMGenerator()
-        st.session_state.customer_profiles = get_customer_profiles()
+# Models are shared by every session: one FinBERT instance per server process
+@st.cache_resource(show_spinner='🚀 Loading AI and FRI models...')
+def load_analyzer():
+    return FinBERTAnalyzer()
+
+@st.cache_resource
+def load_fri():
+    return FRICalculator()
+
+@st.cache_data
+def load_customer_profiles():
+    return get_customer_profiles()
+
+analyzer = load_analyzer()
+fri_calc = load_fri()
+customer_profiles = load_customer_profiles()
+
+# Per-customer data, cached across reruns (show_spinner=False: also called from worker threads)
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def cached_transactions(customer_id):
+    return get_transaction_history(customer_id)
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def cached_fri(customer_id):
+    return fri_calc.calculate_fri(cached_transactions(customer_id))
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def cached_monthly_fri(customer_id):
+    return fri_calc.calculate_monthly_fri(cached_transactions(customer_id))
+
+# Initialize session state - the LLM holds this session's provider and API key
+if 'llm' not in st.session_state:
+    st.session_state.llm = LLMGenerator()
 
 # Initialize API keys from secrets.toml (persistent) or empty string
 if 'openai_api_key' not in st.session_state:
@@ -180,50 +207,36 @@ def chat_interface(customer_data, show_technical, show_prompt):
     
     if analyze_button and customer_message:
         with st.spinner('🤖 AI is analyzing...'):
-            # Progress bar for demo effect
+            # Progress bar advances as each analysis step finishes
             progress_bar = st.progress(0)
             status_text = st.empty()
+            status_text.text("📊 Analyzing sentiment, resilience and similar cases...")
             
             # Step 1: FinBERT Analysis
-            status_text.text("📊 Analyzing sentiment with FinBERT...")
-            progress_bar.progress(20)
-            time.sleep(0.5)
-            
-            sentiment_result = st.session_state.analyzer.analyze_sentiment(customer_message)
-            stress_analysis = st.session_state.analyzer.detect_stress(customer_message)
+            def text_analysis():
+                combined = analyzer.analyze(customer_message)
+                return combined['sentiment'], combined['stress']
             
             # Step 2: FRI Calculation
-            status_text.text("💙  Calculating Financial Resilience Index...")
-            progress_bar.progress(40)
-            time.sleep(0.5)
+            def fri_analysis():
+                return cached_fri(customer_data['customer_id'])
             
-            transactions = get_transaction_history(customer_data['customer_id'])
-            fri_result = st.session_state.fri_calc.calculate_fri(transactions)
+            # Step 3 is RAG retrieval. The three steps are independent,
+            # so they run concurrently
+            with ThreadPoolExecutor(max_workers=3) as pool:
+                steps = {
+                    pool.submit(text_analysis): "📊 Sentiment analyzed with FinBERT",
+                    pool.submit(fri_analysis): "💙  Financial Resilience Index calculated",
+                    pool.submit(analyzer.find_similar_cases, customer_message): "🔎 Similar cases found",
+                }
+                for done, future in enumerate(as_completed(steps), 1):
+                    status_text.text(steps[future])
+                    progress_bar.progress(done * 33)
             
-            # Step 3: RAG Retrieval
-            status_text.text("🔎 Finding similar cases...")
-            progress_bar.progress(60)
-            time.sleep(0.5)
-            
-            similar_cases = st.session_state.analyzer.find_similar_cases(customer_message)
-            
-            # Step 4: LLM Generation
-            status_text.text("✨ Generating personalized coaching response...")
-            progress_bar.progress(80)
-            time.sleep(0.5)
-            
-            coaching_response = st.session_state.llm.generate_coaching(
-                customer_message=customer_message,
-                sentiment_result=sentiment_result,
-                stress_analysis=stress_analysis,
-                fri_result=fri_result,
-                similar_cases=similar_cases,
-                customer_data=customer_data
-            )
+            (sentiment_result, stress_analysis), fri_result, similar_cases = (step.result() for step in steps)
             
             progress_bar.progress(100)
             status_text.text("✅ Analysis complete!")
-            time.sleep(0.5)
             progress_bar.empty()
             status_text.empty()
         
@@ -299,15 +312,27 @@ def chat_interface(customer_data, show_technical, show_prompt):
         llm_status = "🤖 **Real LLM**" if st.session_state.llm.client else "🎭 **Mock Demo**"
         st.markdown(f"*Generated by: {llm_status} ({st.session_state.llm.provider})*")
         
+        # Stream the response into the coaching box as it is generated
+        coaching_box = st.empty()
+        coaching_response = ""
+        for chunk in st.session_state.llm.generate_coaching_stream(
+            customer_message=customer_message,
+            sentiment_result=sentiment_result,
+            stress_analysis=stress_analysis,
+            fri_result=fri_result,
+            similar_cases=similar_cases,
+            customer_data=customer_data
+        ):
+            coaching_response += chunk
+            coaching_box.markdown(f"""
+            <div class="coaching-box">
+                {coaching_response.replace(chr(10), '<br>')}
+            </div>
+            """, unsafe_allow_html=True)
+        
         if st.session_state.llm.last_error:
             st.error(f"⚠️ {st.session_state.llm.last_error}")
         
-        st.markdown(f"""
-        <div class="coaching-box">
-            {coaching_response.replace(chr(10), '<br>')}
-        </div>
-        """, unsafe_allow_html=True)
-        
         # Show prompt if requested
         if show_prompt:
             with st.expander("🔬 View LLM Prompt"):
@@ -333,8 +358,7 @@ def financial_dashboard(customer_data):
     
     st.markdown("### 📈 12-Month Financial Overview")
     
-    transactions = get_transaction_history(customer_data['customer_id'])
-    monthly_fri = st.session_state.fri_calc.calculate_monthly_fri(transactions)
+    monthly_fri = cached_monthly_fri(customer_data['customer_id'])
     
     # Timeline chart
     fig_timeline = create_timeline_chart(monthly_fri)
@@ -491,14 +515,14 @@ def main():
     with st.sidebar:
         st.markdown("## 👤 Customer Profile")
         
-        customer_names = list(st.session_state.customer_profiles.keys())
+        customer_names = list(customer_profiles.keys())
         selected_customer = st.selectbox(
             "Select Customer",
             customer_names,
             help="Choose a customer profile for the demo"
         )
         
-        customer_data = st.session_state.customer_profiles[selected_customer]
+        customer_data = customer_profiles[selected_customer]
         
         st.markdown("### 📊 Customer Info")
         st.write(f"**Age:** {customer_data['age']}")
@@ -3,14 +3,11 @@ Case database for RAG (Retrieval-Augmented Generation)
 Contains successful intervention cases for similarity matching
 """
 
-def get_case_database():
-    """
-    Knowledge base of successful financial interventions
-    
-    Returns:
-    --------
-    list : List of case dictionaries with solutions and improvements
-    """
+import numpy as np
+
+
+def _build_case_database():
+    """Raw case definitions - read once at import into the indexes below"""
     return [
         {
             'description': 'Freelancer with irregular monthly income ranging €800-€3200, experiencing stress about money despite decent annual earnings',
@@ -135,6 +132,61 @@ def get_case_database():
     ]
 
 
+# ============================================================================
+# INDEXES (built once at import; the getters below just return from these)
+# ============================================================================
+
+_ALL_CASES = tuple(_build_case_database())
+
+_CATEGORIES = frozenset(case['category'] for case in _ALL_CASES)
+_SEGMENTS = frozenset(case['customer_segment'] for case in _ALL_CASES)
+
+_BY_CATEGORY = {}
+_BY_SEGMENT = {}
+for _i, _case in enumerate(_ALL_CASES):
+    _BY_CATEGORY.setdefault(_case['category'], []).append(_i)
+    _BY_SEGMENT.setdefault(_case['customer_segment'], []).append(_i)
+_BY_CATEGORY = {k: tuple(v) for k, v in _BY_CATEGORY.items()}
+_BY_SEGMENT = {k: tuple(v) for k, v in _BY_SEGMENT.items()}
+
+# Lowercased (description, solution) per case for search_cases
+_SEARCH_TEXT = tuple((case['description'].lower(), case['solution'].lower())
+                     for case in _ALL_CASES)
+
+# '+18 FRI points (Buffer component)' -> 18
+_IMPROVEMENTS = np.array([int(case['improvement'].split('+')[1].split(' ')[0])
+                          for case in _ALL_CASES], dtype=np.int8)
+
+_TIMEFRAMES = [case['timeframe'] for case in _ALL_CASES]
+
+_STATS = {
+    'total_cases': len(_ALL_CASES),
+    'avg_improvement': float(_IMPROVEMENTS.mean()),
+    'max_improvement': int(_IMPROVEMENTS.max()),
+    'min_improvement': int(_IMPROVEMENTS.min()),
+    'categories': len(_CATEGORIES),
+    'segments': len(_SEGMENTS),
+    'timeframes': {
+        '2_months': _TIMEFRAMES.count('2 months'),
+        '3_months': _TIMEFRAMES.count('3 months'),
+        '4_months': _TIMEFRAMES.count('4 months'),
+        '6_months': _TIMEFRAMES.count('6 months'),
+        '12_months': _TIMEFRAMES.count('12 months')
+    }
+}
+
+
+def get_case_database():
+    """
+    Knowledge base of successful financial interventions
+    
+    Returns:
+    --------
+    list : List of case dictionaries with solutions and improvements
+    """
+    return list(_ALL_CASES)
+
+
 def get_cases_by_category(category):
     """
     Filter cases by category
@@ -148,8 +200,7 @@ def get_cases_by_category(category):
     --------
     list : Filtered list of cases
     """
-    all_cases = get_case_database()
-    return [case for case in all_cases if case['category'] == category]
+    return [_ALL_CASES[i] for i in _BY_CATEGORY.get(category, ())]
 
 
 def get_cases_by_segment(segment):
@@ -165,20 +216,17 @@ def get_cases_by_segment(segment):
     --------
     list : Filtered list of cases
     """
-    all_cases = get_case_database()
-    return [case for case in all_cases if case['customer_segment'] == segment]
+    return [_ALL_CASES[i] for i in _BY_SEGMENT.get(segment, ())]
 
 
 def get_case_categories():
     """Get all unique categories"""
-    all_cases = get_case_database()
-    return list(set(case['category'] for case in all_cases))
+    return list(_CATEGORIES)
 
 
 def get_customer_segments():
     """Get all unique customer segments"""
-    all_cases = get_case_database()
-    return list(set(case['customer_segment'] for case in all_cases))
+    return list(_SEGMENTS)
 
 
 def search_cases(query_text):
@@ -194,17 +242,11 @@ def search_cases(query_text):
     --------
     list : Matching cases
     """
-    all_cases = get_case_database()
     query_lower = query_text.lower()
     
-    matching_cases = []
-    for case in all_cases:
-        # Search in description and solution
-        if (query_lower in case['description'].lower() or 
-            query_lower in case['solution'].lower()):
-            matching_cases.append(case)
-    
-    return matching_cases
+    # Search in description and solution
+    return [case for case, (description, solution) in zip(_ALL_CASES, _SEARCH_TEXT)
+            if query_lower in description or query_lower in solution]
 
 
 def get_case_statistics():
@@ -215,30 +257,8 @@ def get_case_statistics():
     --------
     dict : Statistics about cases
     """
-    all_cases = get_case_database()
-    
-    # Calculate average improvements
-    improvements = [int(case['improvement'].split('+')[1].split(' ')[0]) 
-                   for case in all_cases]
-    
-    # Get timeframes
-    timeframes = [case['timeframe'] for case in all_cases]
-    
-    return {
-        'total_cases': len(all_cases),
-        'avg_improvement': sum(improvements) / len(improvements),
-        'max_improvement': max(improvements),
-        'min_improvement': min(improvements),
-        'categories': len(get_case_categories()),
-        'segments': len(get_customer_segments()),
-        'timeframes': {
-            '2_months': timeframes.count('2 months'),
-            '3_months': timeframes.count('3 months'),
-            '4_months': timeframes.count('4 months'),
-            '6_months': timeframes.count('6 months'),
-            '12_months': timeframes.count('12 months')
-        }
-    }
+    # Copy so callers can't mutate the shared snapshot
+    return {**_STATS, 'timeframes': dict(_STATS['timeframes'])}
 
 
 # Example usage for testing
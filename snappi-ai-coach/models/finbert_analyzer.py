@@ -128,7 +128,15 @@ class FinBERTAnalyzer:
                           key=lambda x: {'positive': positive, 'negative': negative, 'neutral': neutral}[x])
         }
     
-    def detect_stress(self, text):
+    def analyze(self, text):
+        """Sentiment and stress for one message from a single FinBERT forward pass"""
+        sentiment = self.analyze_sentiment(text)
+        return {
+            'sentiment': sentiment,
+            'stress': self.detect_stress(text, sentiment)
+        }
+    
+    def detect_stress(self, text, sentiment=None):
         """
         Advanced context-aware stress detection system
         
@@ -140,13 +148,17 @@ class FinBERTAnalyzer:
         - Mitigators (BUT improving, HOWEVER better)
         - Question vs statement differentiation
         
+        Pass a precomputed analyze_sentiment() result as `sentiment` to skip
+        the FinBERT forward pass.
+        
         Returns comprehensive stress analysis with transparency
         """
         
         text_lower = text.lower()
         
-        # Step 1: Get base sentiment from FinBERT
-        sentiment = self.analyze_sentiment(text)
+        # Step 1: Get base sentiment from FinBERT (unless already computed)
+        if sentiment is None:
+            sentiment = self.analyze_sentiment(text)
         negative_score = sentiment['negative']
         
         # Step 2: Detect multi-word stress phrases (highest priority)
@@ -80,6 +80,33 @@ class LLMGenerator:
                 customer_message, stress_analysis, fri_result, similar_cases, customer_data
             )
     
+    def generate_coaching_stream(self, customer_message, sentiment_result, 
+                                stress_analysis, fri_result, similar_cases, customer_data):
+        """Streaming variant of generate_coaching: yields the response as text chunks"""
+        
+        use_llm = (
+            self.provider not in ["mock", "demo"] and 
+            "mock" not in self.provider and 
+            "demo" not in self.provider and
+            self.client is not None
+        )
+        
+        if use_llm and ("claude" in self.provider or "openai" in self.provider or "gpt" in self.provider):
+            prompt = self._build_prompt(
+                customer_message, sentiment_result, stress_analysis,
+                fri_result, similar_cases, customer_data
+            )
+            print(f"   → Streaming from {self.provider}...")
+            if "claude" in self.provider:
+                yield from self._stream_claude(prompt)
+            else:
+                yield from self._stream_openai(prompt)
+            return
+        
+        yield self._generate_mock_response(
+            customer_message, stress_analysis, fri_result, similar_cases, customer_data
+        )
+    
     def _build_prompt(self, message, sentiment, stress, fri, cases, customer):
         """Build comprehensive prompt for LLM"""
         
@@ -186,6 +213,43 @@ Begin your response now:"""
             self.last_error = error_msg
             return f"**Error calling Claude:** {str(e)}\n\n---\n\n**Falling back to demo response...**\n\n" + self._generate_mock_response_simple()
     
+    def _stream_openai(self, prompt):
+        """Stream from OpenAI API, yielding text deltas"""
+        try:
+            stream = self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": "You are Fiona, a compassionate, expert financial wellness coach for Snappi Bank. Holder of a PhD in behavioral Economics and Finance."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=1000,
+                temperature=0.7,
+                stream=True
+            )
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            error_msg = f"❌ OpenAI API Error: {str(e)}"
+            print(error_msg)
+            self.last_error = error_msg
+            yield f"\n\n**Error calling OpenAI:** {str(e)}\n\n---\n\n**Falling back to demo response...**\n\n" + self._generate_mock_response_simple()
+    
+    def _stream_claude(self, prompt):
+        """Stream from Claude API, yielding text deltas"""
+        try:
+            with self.client.messages.stream(
+                model="claude-sonnet-4-20250514",
+                max_tokens=1000,
+                messages=[{"role": "user", "content": prompt}]
+            ) as stream:
+                yield from stream.text_stream
+        except Exception as e:
+            error_msg = f"❌ Claude API Error: {str(e)}"
+            print(error_msg)
+            self.last_error = error_msg
+            yield f"\n\n**Error calling Claude:** {str(e)}\n\n---\n\n**Falling back to demo response...**\n\n" + self._generate_mock_response_simple()
+    
     def _generate_mock_response_simple(self):
         """Simple mock response for errors"""
         return "This is a demo response. Please check your API key and try again."
@@ -1,5 +1,7 @@
+import functools
 import plotly.graph_objects as go
 import plotly.express as px
+import plotly.io as pio
 
 # Dark theme template
 DARK_TEMPLATE = {
@@ -8,13 +10,27 @@ DARK_TEMPLATE = {
         'plot_bgcolor': '#1e1e2e',
         'font': {'color': '#ffffff'},
         'xaxis': {'gridcolor': '#2a2a3e', 'color': '#ffffff'},
-        'yaxis': {'gridcolor': '#2a2a3e', 'color': '#ffffff'}
+        'yaxis': {'gridcolor': '#2a2a3e', 'color': '#ffffff'},
+        'polar': {
+            'bgcolor': '#1e1e2e',
+            'radialaxis': {'gridcolor': '#2a2a3e'},
+            'angularaxis': {'gridcolor': '#2a2a3e'}
+        }
     }
 }
 
+# Registered once; figures reference it by name instead of repeating the styling
+pio.templates['fiona_dark'] = go.layout.Template(layout=DARK_TEMPLATE['layout'])
+
+# Figures are cached on their (rounded) inputs, so reruns with the same data
+# reuse the built figure. Cached figures are shared - callers must not mutate them.
+
 def create_fri_gauge(score):
     """Create FRI gauge chart with dark theme"""
-    
+    return _fri_gauge(round(float(score), 1))
+
+@functools.lru_cache(maxsize=64)
+def _fri_gauge(score):
     fig = go.Figure(go.Indicator(
         mode="gauge+number+delta",
         value=score,
@@ -41,22 +57,20 @@ def create_fri_gauge(score):
     ))
     
     fig.update_layout(
+        template='fiona_dark',
         height=300,
-        margin=dict(l=20, r=20, t=50, b=20),
-        paper_bgcolor='#1e1e2e',
-        plot_bgcolor='#1e1e2e',
-        font={'color': '#ffffff'}
+        margin=dict(l=20, r=20, t=50, b=20)
     )
     
     return fig
 
 def create_component_radar(components):
     """Create radar chart for FRI components with dark theme"""
-    
-    categories = [c['name'] for c in components]
-    values = [c['score'] for c in components]
-    values.append(values[0])  # Close the loop
-    categories.append(categories[0])
+    return _component_radar(tuple((c['name'], round(float(c['score']), 1)) for c in components))
+
+@functools.lru_cache(maxsize=64)
+def _component_radar(components):
+    categories, values = zip(*(components + components[:1]))  # Close the loop
     
     fig = go.Figure(data=go.Scatterpolar(
         r=values,
@@ -67,35 +81,28 @@ def create_component_radar(components):
     ))
     
     fig.update_layout(
+        template='fiona_dark',
         polar=dict(
             radialaxis=dict(
                 visible=True,
-                range=[0, 100],
-                gridcolor='#2a2a3e',
-                tickfont={'color': '#ffffff'}
-            ),
-            angularaxis=dict(
-                gridcolor='#2a2a3e',
-                tickfont={'color': '#ffffff'}
-            ),
-            bgcolor='#1e1e2e'
+                range=[0, 100]
+            )
         ),
         showlegend=False,
         title="FRI Component Analysis",
-        title_font={'color': '#ffffff'},
-        height=400,
-        paper_bgcolor='#1e1e2e',
-        plot_bgcolor='#1e1e2e',
-        font={'color': '#ffffff'}
+        height=400
     )
     
     return fig
 
 def create_timeline_chart(monthly_fri):
     """Create FRI timeline chart with dark theme"""
-    
-    months = [m['month'] for m in monthly_fri]
-    totals = [m['total'] for m in monthly_fri]
+    return _timeline_chart(tuple((m['month'], round(float(m['total']), 1)) for m in monthly_fri))
+
+@functools.lru_cache(maxsize=16)
+def _timeline_chart(monthly_fri):
+    months = [month for month, _ in monthly_fri]
+    totals = [total for _, total in monthly_fri]
     
     fig = go.Figure()
     
@@ -133,23 +140,12 @@ def create_timeline_chart(monthly_fri):
     )
     
     fig.update_layout(
+        template='fiona_dark',
         title="Financial Resilience Trajectory (12 Months)",
-        title_font={'color': '#ffffff'},
         xaxis_title="Month",
         yaxis_title="FRI Score",
         height=400,
-        hovermode='x unified',
-        paper_bgcolor='#1e1e2e',
-        plot_bgcolor='#1e1e2e',
-        font={'color': '#ffffff'},
-        xaxis=dict(
-            gridcolor='#2a2a3e',
-            tickfont={'color': '#ffffff'}
-        ),
-        yaxis=dict(
-            gridcolor='#2a2a3e',
-            tickfont={'color': '#ffffff'}
-        )
+        hovermode='x unified'
     )
     
     return fig
\ No newline at end of file